@@ -0,0 +1,113 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+class AllocationMonitor:
+    # Allocation-budget mode: per-frame allocation figures from tracemalloc
+    # and every garbage collection from gc.callbacks.
+    #
+    # For each frame it records the net change in traced memory and the
+    # transient peak above the frame's starting point (short-lived garbage
+    # that refcounting frees within the frame still shows up there). Every
+    # `interval` frames it diffs two tracemalloc snapshots and prints the
+    # sites (file:line) with the largest net allocation per frame; net
+    # growth of container objects is what triggers CPython's generation-0
+    # collections. Collections longer than `pause_log_ms` are logged as they
+    # happen, and frames whose transient peak exceeds `budget` bytes are
+    # counted.
+    def __init__(self, interval=300, top=8, pause_log_ms=1.0, budget=64 * 1024, out=sys.stdout):
+        self.interval = interval
+        self.top = top
+        self.pause_log_ms = pause_log_ms
+        self.budget = budget
+        self.out = out
+        self.frames = 0
+        self.net = []
+        self.transient = []
+        self.over_budget = 0
+        self.pauses = []
+        self.gc_start = None
+        self.frame_start = 0
+        self.snapshot = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+        self.snapshot = tracemalloc.take_snapshot()
+        gc.callbacks.append(self.on_gc)
+
+    def stop(self):
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        self.print_summary()
+        tracemalloc.stop()
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+            return
+        if self.gc_start is None:
+            return
+        pause = time.perf_counter() - self.gc_start
+        self.gc_start = None
+        self.pauses.append((info['generation'], pause, info['collected']))
+        if pause * 1000 >= self.pause_log_ms:
+            print(f"gc: gen {info['generation']} pause {pause * 1000:.2f} ms, "
+                  f"{info['collected']} collected (frame {self.frames})", file=self.out)
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self.frame_start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        current, peak = tracemalloc.get_traced_memory()
+        transient = peak - self.frame_start
+        self.net.append(current - self.frame_start)
+        self.transient.append(transient)
+        if transient > self.budget:
+            self.over_budget += 1
+        self.frames += 1
+        if self.frames % self.interval == 0:
+            self.print_sites()
+
+    def print_sites(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+        stats = snapshot.compare_to(self.snapshot, 'lineno')
+        self.snapshot = snapshot
+        frames = self.interval
+        print(f"allocations, frames {self.frames - frames}-{self.frames}, net per frame by site:",
+              file=self.out)
+        for stat in sorted(stats, key=lambda s: abs(s.count_diff), reverse=True)[:self.top]:
+            if not stat.count_diff:
+                break
+            frame = stat.traceback[0]
+            print(f"  {stat.count_diff / frames:+9.2f} blocks {stat.size_diff / frames:+10.1f} B  "
+                  f"{frame.filename}:{frame.lineno}", file=self.out)
+
+    def stats(self):
+        frames = max(1, self.frames)
+        by_gen = [0, 0, 0]
+        for generation, _, _ in self.pauses:
+            by_gen[generation] += 1
+        transient = sorted(self.transient) or [0]
+        return {
+            'frames': self.frames,
+            'net_bytes_per_frame': sum(self.net) / frames,
+            'transient_bytes_p50': transient[len(transient) // 2],
+            'transient_bytes_max': transient[-1],
+            'frames_over_budget': self.over_budget,
+            'collections_per_1000_frames': [n * 1000 / frames for n in by_gen],
+            'gc_pause_max_ms': max((p for _, p, _ in self.pauses), default=0.0) * 1000,
+            'gc_pause_total_ms': sum(p for _, p, _ in self.pauses) * 1000,
+        }
+
+    def print_summary(self):
+        print("allocations:", file=self.out)
+        for name, value in self.stats().items():
+            if isinstance(value, list):
+                value = " / ".join(f"{v:.1f}" for v in value)
+            elif isinstance(value, float):
+                value = f"{value:.2f}"
+            print(f"  {name}: {value}", file=self.out)
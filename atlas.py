@@ -0,0 +1,124 @@
+import json
+import os
+
+import pygame
+
+class SpriteAtlas:
+    # Cache of pre-rendered sprites keyed by tuples like ('enemy', 'tank').
+    # key[0] selects a builder from `builders`, which is called with the
+    # rest of the key and returns (surface, (offset_x, offset_y)). Missing
+    # sprites are built on first use. save()/load() store the whole atlas as
+    # one PNG sheet plus a JSON index so later launches skip generation.
+    def __init__(self, builders, version=1):
+        self.builders = builders
+        self.version = version
+        self.sprites = {}
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def get(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            surface, offset = self.builders[key[0]](*key[1:])
+            sprite = self.sprites[key] = (surface, offset)
+            self.dirty = True
+        return sprite
+
+    def build(self, keys):
+        for key in keys:
+            self.get(key)
+
+    def item(self, key, x, y):
+        # (surface, position) pair ready for Surface.blits
+        surface, (ox, oy) = self.get(key)
+        return surface, (x + ox, y + oy)
+
+    def convert(self):
+        # Switch to the display pixel format once a window exists
+        if pygame.display.get_surface() is None:
+            return
+        for key, (surface, offset) in self.sprites.items():
+            self.sprites[key] = (surface.convert_alpha(), offset)
+
+    def save(self, path):
+        # Packs sprites left to right into shelves of at most 512px
+        sheet_w = 512
+        placed = []
+        x = y = shelf_h = 0
+        for key, (surface, offset) in self.sprites.items():
+            w, h = surface.get_size()
+            if x + w > sheet_w:
+                x, y, shelf_h = 0, y + shelf_h, 0
+            placed.append((key, surface, offset, (x, y, w, h)))
+            x += w
+            shelf_h = max(shelf_h, h)
+        sheet_h = max(1, y + shelf_h)
+
+        sheet = pygame.Surface((sheet_w, sheet_h), pygame.SRCALPHA)
+        sheet.fill((0, 0, 0, 0))
+        index = []
+        for key, surface, offset, rect in placed:
+            sheet.blit(surface, rect[:2])
+            index.append({'key': list(key), 'rect': list(rect), 'offset': list(offset)})
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        pygame.image.save(sheet, path)
+        with open(path + '.json', 'w') as f:
+            json.dump({'version': self.version, 'sprites': index}, f)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path, builders, version=1):
+        # Returns an empty atlas when the cache is missing or out of date
+        atlas = cls(builders, version)
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            if meta.get('version') != version:
+                return atlas
+            sheet = pygame.image.load(path)
+        except (OSError, ValueError, pygame.error):
+            return atlas
+
+        for entry in meta['sprites']:
+            surface = sheet.subsurface(pygame.Rect(entry['rect'])).copy()
+            atlas.sprites[tuple(entry['key'])] = (surface, tuple(entry['offset']))
+        return atlas
+
+class ScaledAtlas:
+    # Another atlas's sprites and offsets resized by `scale`, for drawing
+    # at a render scale other than 1. item() takes logical positions and
+    # returns render-surface ones; get() offsets are already scaled.
+    def __init__(self, atlas, scale):
+        self.atlas = atlas
+        self.scale = scale
+        self.sprites = {}
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def get(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            surface, (ox, oy) = self.atlas.get(key)
+            s = self.scale
+            w, h = surface.get_size()
+            size = (max(1, round(w * s)), max(1, round(h * s)))
+            # Filtered where there is per-pixel alpha to blend edges into,
+            # nearest neighbour for colour-keyed sprites
+            if surface.get_flags() & pygame.SRCALPHA:
+                surface = pygame.transform.smoothscale(surface, size)
+            else:
+                surface = pygame.transform.scale(surface, size)
+            sprite = self.sprites[key] = (surface, (round(ox * s), round(oy * s)))
+        return sprite
+
+    def build(self, keys):
+        for key in keys:
+            self.get(key)
+
+    def item(self, key, x, y):
+        surface, (ox, oy) = self.get(key)
+        return surface, (int(x * self.scale) + ox, int(y * self.scale) + oy)
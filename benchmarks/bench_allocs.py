@@ -0,0 +1,67 @@
+# Allocation and garbage collection figures for the stress scenarios.
+#
+#   python -m benchmarks.bench_allocs
+#   python -m benchmarks.bench_allocs --scenario swarm_500 --sites
+#
+# Runs each scenario headless (step and draw to an offscreen surface) under
+# allocs.AllocationMonitor after a warmup, and prints the net and transient
+# bytes allocated per frame, collections per 1000 frames by generation and
+# the longest collection pause. --sites also prints the allocation sites.
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import io
+import sys
+
+import pygame
+
+from allocs import AllocationMonitor
+from benchmarks.stress import SCENARIOS, invulnerable
+from space_defender import FPS, HEIGHT, INPUT_FIRE, INPUT_LEFT, INPUT_RIGHT, WIDTH, Renderer, World
+
+def run(name, ticks, warmup, sites):
+    setup, hook = SCENARIOS[name]
+    world = World(seed=1)
+    invulnerable(world)
+    setup(world)
+    renderer = Renderer()
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    monitor = AllocationMonitor(interval=ticks if sites else ticks + 1, out=sys.stdout if sites else io.StringIO())
+
+    for tick in range(warmup + ticks):
+        if tick == warmup:
+            monitor.start()
+        if hook:
+            hook(world)
+        invulnerable(world)
+        if tick >= warmup:
+            monitor.begin_frame()
+        world.step(INPUT_FIRE | (INPUT_LEFT if (tick // FPS) % 2 else INPUT_RIGHT))
+        renderer.draw(surface, world)
+        if tick >= warmup:
+            monitor.end_frame()
+    stats = monitor.stats()
+    monitor.out = io.StringIO()
+    monitor.stop()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocation benchmark")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=120)
+    parser.add_argument('--sites', action='store_true', help="print the top allocation sites")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<22} {'net B/f':>9} {'transient p50':>14} {'max':>9} "
+          f"{'gc/1000f (0/1/2)':>18} {'max pause ms':>13}")
+    for name in args.scenario or SCENARIOS:
+        s = run(name, args.ticks, args.warmup, args.sites)
+        gcs = "/".join(f"{n:.0f}" for n in s['collections_per_1000_frames'])
+        print(f"{name:<22} {s['net_bytes_per_frame']:>9.0f} {s['transient_bytes_p50']:>14} "
+              f"{s['transient_bytes_max']:>9} {gcs:>18} {s['gc_pause_max_ms']:>13.2f}")
+
+if __name__ == "__main__":
+    main()
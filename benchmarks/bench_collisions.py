@@ -0,0 +1,50 @@
+# Tick time against entity count for the collision broadphase.
+#
+#   python -m benchmarks.bench_collisions
+#
+# Each scenario fills a World with N enemies and N player bullets spread over
+# the screen and measures World.step() with no spawning or rendering.
+import random
+import time
+
+from space_defender import HEIGHT, WIDTH, Enemy, World, spawn_bullet
+
+COUNTS = [25, 50, 100, 200, 400, 800]
+TICKS = 200
+
+def populate(world, count):
+    world.enemies = []
+    world.bullets.clear()
+    for _ in range(count):
+        e = Enemy(random.choice(['normal', 'fast', 'tank']))
+        e.y = random.uniform(0, HEIGHT - 200)
+        e.speed = 0
+        e.health = 10 ** 6
+        world.enemies.append(e)
+        spawn_bullet(world.bullets, random.uniform(0, WIDTH), random.uniform(100, HEIGHT))
+
+def run(count):
+    random.seed(count)
+    world = World()
+    world.player.health = 10 ** 9
+    world.enemy_spawn_timer = -10 ** 9
+    world.powerup_spawn_timer = -10 ** 9
+    populate(world, count)
+
+    elapsed = 0.0
+    for _ in range(TICKS):
+        # Keep the population constant: refill bullets consumed by hits
+        while len(world.bullets) < count:
+            spawn_bullet(world.bullets, random.uniform(0, WIDTH), HEIGHT - 1)
+        start = time.perf_counter()
+        world.step(0)
+        elapsed += time.perf_counter() - start
+    return elapsed / TICKS
+
+def main():
+    print(f"{'entities':>10} {'tick ms':>10}")
+    for count in COUNTS:
+        print(f"{count * 2:>10} {run(count) * 1000:>10.3f}")
+
+if __name__ == "__main__":
+    main()
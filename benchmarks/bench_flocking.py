@@ -0,0 +1,96 @@
+# Tick time of steered enemy swarms against swarm size.
+#
+#   python -m benchmarks.bench_flocking
+#   python -m benchmarks.bench_flocking --count 500 --ticks 600
+#
+# Each run fills a World with N flocking fast enemies spread over the
+# screen, wrapping any that reach the bottom back to the top so the swarm
+# stays at N, and times the whole World.step() and the steering pass
+# (World.steer_enemies) inside it. The last column times finding the
+# neighbour pairs by testing every pair, the O(n^2) approach the shared
+# grid replaces. Pairs grow faster than N because the screen doesn't.
+import argparse
+import random
+import time
+
+import numpy as np
+
+from space_defender import HEIGHT, NEIGHBOR_RADIUS, WIDTH, Enemy, World
+
+COUNTS = [125, 250, 500, 1000]
+
+def flocker(rng):
+    e = Enemy('fast', rng)
+    e.behavior = 'flock'
+    e.health = 10 ** 6
+    return e
+
+def populate(world, count, rng):
+    world.enemies = []
+    for _ in range(count):
+        e = flocker(rng)
+        e.x = e.px = rng.uniform(0, WIDTH - e.w)
+        e.y = e.py = rng.uniform(0, HEIGHT)
+        world.enemies.append(e)
+
+def brute_force_pairs(x, y, radius):
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    d2 = dx * dx + dy * dy
+    np.fill_diagonal(d2, np.inf)
+    return np.nonzero(d2 < radius * radius)
+
+def run(count, ticks):
+    rng = random.Random(count)
+    world = World(seed=count)
+    world.player.health = 10 ** 9
+    world.enemy_spawn_timer = -10 ** 9
+    world.powerup_spawn_timer = -10 ** 9
+    populate(world, count, rng)
+
+    # Time the steering pass from inside step()
+    steer_time = [0.0]
+    steer_enemies = world.steer_enemies
+    def timed_steer(enemies):
+        start = time.perf_counter()
+        steer_enemies(enemies)
+        steer_time[0] += time.perf_counter() - start
+    world.steer_enemies = timed_steer
+
+    step = brute = 0.0
+    pairs = 0
+    for _ in range(ticks):
+        # Wrap enemies about to leave, and replace any that rammed the
+        # player, so the swarm stays at `count`
+        for e in world.enemies:
+            if e.y > HEIGHT - 60:
+                e.y = e.py = -e.h
+        while len(world.enemies) < count:
+            world.enemies.append(flocker(rng))
+
+        x = np.array([e.x for e in world.enemies])
+        y = np.array([e.y for e in world.enemies])
+        start = time.perf_counter()
+        brute_force_pairs(x, y, NEIGHBOR_RADIUS)
+        brute += time.perf_counter() - start
+        world.neighbors.build(x, y)
+        pairs += len(world.neighbors.pairs(NEIGHBOR_RADIUS)[0])
+
+        start = time.perf_counter()
+        world.step(0)
+        step += time.perf_counter() - start
+    return steer_time[0] / ticks, step / ticks, brute / ticks, pairs / ticks
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flocking enemy benchmark")
+    parser.add_argument('--count', type=int, action='append', help="swarm size (repeatable)")
+    parser.add_argument('--ticks', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    print(f"{'enemies':>8} {'pairs':>8} {'steer ms':>10} {'step ms':>10} {'n^2 pairs ms':>13}")
+    for count in args.count or COUNTS:
+        steer, step, brute, pairs = run(count, args.ticks)
+        print(f"{count:>8} {pairs:>8.0f} {steer * 1000:>10.3f} {step * 1000:>10.3f} {brute * 1000:>13.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Bandwidth and latency of networked co-op over localhost.
+#
+#   python -m benchmarks.bench_netplay --seconds 10
+#
+# Runs a NetServer and two headless NetClients in one event loop through a
+# phase 2 boss fight with invulnerable players, the clients sweeping and
+# firing. Reports per-client downstream bandwidth against what sending the
+# full state every tick would cost, upstream bandwidth, input round-trip
+# time (input sent until a state applying it arrives) and how often
+# prediction had to correct the local player.
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import asyncio
+
+import numpy as np
+
+from netplay import FRAME, NO_TICK, NetClient, NetServer, diff, encode_state, world_records
+from patterns import Emitter
+from space_defender import BULLET_PATTERNS, FPS, INPUT_FIRE, INPUT_LEFT, INPUT_RIGHT, Boss, World
+
+class MeasuredServer(NetServer):
+    # Also totals what a full (non-delta) state would have cost each tick
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.full_bytes = 0
+        self.enemy_bullets = []
+
+    def broadcast(self):
+        world = self.world
+        _, changed, _ = diff({}, world_records(world), self.ticks)
+        self.full_bytes += FRAME.size + len(encode_state(world, self.ticks, NO_TICK, 0, [], changed))
+        self.enemy_bullets.append(len(world.enemy_bullets))
+        super().broadcast()
+
+def boss_fight(world, pattern=None):
+    for p in world.players:
+        p.health = p.max_health = 10 ** 9
+    world.wave = 5
+    boss = world.boss = Boss()
+    world.boss_active = True
+    boss.health = boss.max_health = 10 ** 6
+    boss.phase = 2
+    if pattern:
+        boss.emitters[2] = [Emitter(BULLET_PATTERNS[pattern])]
+
+async def bot(client, index, seconds):
+    loop = asyncio.get_running_loop()
+    receiver = asyncio.ensure_future(client.receive())
+    start = loop.time()
+    for tick in range(int(seconds * FPS)):
+        # Sweep side to side with the trigger held, players out of phase
+        side = (tick // FPS + index) % 2
+        client.send_input(INPUT_FIRE | (INPUT_LEFT if side else INPUT_RIGHT))
+        client.sync_world()
+        await asyncio.sleep(max(0.0, start + (tick + 1) / FPS - loop.time()))
+    client.close()
+    receiver.cancel()
+
+async def run(seconds, pattern=None):
+    world = World(seed=1, players=2)
+    boss_fight(world, pattern)
+    server = MeasuredServer(world, port=0)
+    await server.start()
+    clients = [NetClient(), NetClient()]
+    for client in clients:
+        await client.connect('127.0.0.1', server.port)
+    serving = asyncio.ensure_future(server.run())
+    await asyncio.gather(*(bot(c, i, seconds) for i, c in enumerate(clients)))
+    await asyncio.wait_for(serving, 5)
+    await server.close()
+    return server, clients
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Networked co-op bandwidth and latency")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--pattern', choices=sorted(BULLET_PATTERNS),
+                        help="boss phase 2 bullet pattern (default: the game's own)")
+    args = parser.parse_args(argv)
+
+    server, clients = asyncio.run(run(args.seconds, args.pattern))
+    ticks = max(1, server.ticks)
+    elapsed = ticks / FPS
+    full = server.full_bytes / ticks
+    print(f"{ticks} ticks, {np.mean(server.enemy_bullets):.0f} enemy bullets on average "
+          f"(max {max(server.enemy_bullets)})")
+    print(f"full state every tick: {full:.0f} B/tick, {full * FPS * 8 / 1000:.1f} kbit/s")
+    for i, client in enumerate(clients):
+        rtt = np.array(client.rtts) * 1000
+        down = client.bytes_in / max(1, client.states)
+        print(f"client {i + 1}: down {client.bytes_in * 8 / elapsed / 1000:.1f} kbit/s "
+              f"({down:.0f} B/state, {down / full:.1%} of full), "
+              f"up {client.bytes_out * 8 / elapsed / 1000:.1f} kbit/s")
+        if len(rtt):
+            print(f"          input rtt p50 {np.percentile(rtt, 50):.1f} ms, p95 {np.percentile(rtt, 95):.1f} ms, "
+                  f"max {rtt.max():.1f} ms; {client.corrections} prediction corrections")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Frame rate and tick lateness of the pipelined (threaded simulation) mode.
+#
+#   python -m benchmarks.bench_pipeline
+#   python -m benchmarks.bench_pipeline --scenario swarm_500 --present-ms 8
+#
+# Both modes do the same work for --seconds of wall time: the simulation
+# is paced at FPS ticks per second, as in the game, and each frame drawn
+# shows a different tick (a frame is only drawn once a new tick exists, so
+# neither mode can pad its count by redrawing a frame it already showed).
+#   serial     one FixedTimestep loop steps, draws and presents, as main()
+#              does without --pipeline
+#   pipelined  a SimulationThread steps and publishes frames while this
+#              thread draws and presents the latest one
+# Reported per mode: ticks run and dropped (time the pacer gave up on),
+# distinct frames per second, and how late each tick ran against its
+# schedule. --present-ms adds a blocking sleep per present, standing in
+# for a flip that waits on vsync (it releases the GIL, as SDL's flip does).
+# Overlap needs that kind of wait or a second core: with one core and no
+# waits, the threads only take turns.
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import time
+
+import numpy as np
+import pygame
+
+from benchmarks.stress import SCENARIOS, invulnerable
+from pacing import FixedTimestep
+from pipeline import SimulationThread
+from space_defender import (
+    FPS, HEIGHT, INPUT_FIRE, INPUT_LEFT, INPUT_RIGHT, MAX_CATCHUP_STEPS, WIDTH, Renderer, World,
+)
+
+class Run:
+    # A scenario world and a tick function that records how late each
+    # tick ran: tick n is due at the first tick's time plus (n + ticks the
+    # pacer dropped) * dt
+    def __init__(self, name):
+        setup, self.hook = SCENARIOS[name]
+        self.world = World(seed=1)
+        invulnerable(self.world)
+        setup(self.world)
+        self.pacer = None
+        self.start = None
+        self.lateness = []
+
+    def tick(self, inputs):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        due = self.start + (len(self.lateness) + self.pacer.dropped_ticks) * self.pacer.dt
+        self.lateness.append(max(0.0, now - due))
+        world = self.world
+        if self.hook:
+            self.hook(world)
+        invulnerable(world)
+        # Sweep side to side with the trigger held
+        world.step(INPUT_FIRE | (INPUT_LEFT if (world.tick // FPS) % 2 else INPUT_RIGHT))
+
+    def report(self, elapsed, frames):
+        late = np.array(self.lateness) * 1000
+        return {
+            'ticks': len(late),
+            'dropped': self.pacer.dropped_ticks,
+            'fps': frames / elapsed,
+            'late_p50': float(np.percentile(late, 50)),
+            'late_p95': float(np.percentile(late, 95)),
+            'late_max': float(late.max()),
+            'elapsed': elapsed,
+        }
+
+def present(delay):
+    pygame.display.flip()
+    if delay:
+        time.sleep(delay)
+
+def serial(name, seconds, screen, delay):
+    run = Run(name)
+    run.pacer = pacer = FixedTimestep(FPS, MAX_CATCHUP_STEPS)
+    renderer = Renderer()
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        steps = pacer.advance()
+        for _ in range(steps):
+            run.tick(0)
+        if steps:
+            renderer.draw(screen, run.world)
+            present(delay)
+            frames += 1
+        else:
+            time.sleep(max(0.0, pacer.dt - pacer.accumulator))
+    return run.report(time.perf_counter() - start, frames)
+
+def pipelined(name, seconds, screen, delay):
+    run = Run(name)
+    renderer = Renderer()
+    sim = SimulationThread(run.world, run.tick, FPS, MAX_CATCHUP_STEPS)
+    run.pacer = sim.pacer
+    frames = 0
+    shown = -1
+    start = time.perf_counter()
+    sim.start()
+    while time.perf_counter() - start < seconds and sim.is_alive():
+        state = sim.buffer.read()
+        if state.tick == shown:
+            time.sleep(0.0005)
+            continue
+        shown = state.tick
+        renderer.draw(screen, state)
+        present(delay)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    sim.stop()
+    return run.report(elapsed, frames)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipelined render benchmark")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='wave20_spawns')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--present-ms', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    pygame.display.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    delay = args.present_ms / 1000
+    print(f"{os.cpu_count()} CPUs, scenario {args.scenario}, {args.seconds:g} s at {FPS} ticks/s, "
+          f"present +{args.present_ms:g} ms")
+    print(f"{'mode':<10} {'ticks/s':>8} {'dropped':>8} {'frames/s':>9} "
+          f"{'late p50':>9} {'p95':>7} {'max ms':>7}")
+    for mode, bench in (('serial', serial), ('pipelined', pipelined)):
+        r = bench(args.scenario, args.seconds, screen, delay)
+        print(f"{mode:<10} {r['ticks'] / r['elapsed']:>8.1f} {r['dropped']:>8} {r['fps']:>9.1f} "
+              f"{r['late_p50']:>9.2f} {r['late_p95']:>7.2f} {r['late_max']:>7.2f}")
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Snapshot size and save/restore time against entity count.
+#
+#   python -m benchmarks.bench_snapshot
+#
+# Builds worlds with N enemies and N of each bullet kind (plus a full
+# particle burst) and times save_snapshot() and load_snapshot().
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import time
+
+from space_defender import HEIGHT, KILL_COLORS, WIDTH, Enemy, World, spawn_bullet, spawn_enemy_bullet
+
+def populate(world, n):
+    rng = world.rng
+    for _ in range(n):
+        e = Enemy(rng.choice(['normal', 'fast', 'tank']), rng)
+        e.y = rng.uniform(0, HEIGHT)
+        world.enemies.append(e)
+        spawn_bullet(world.bullets, rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+        spawn_enemy_bullet(world.enemy_bullets, rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT))
+    if n:
+        world.burst(WIDTH / 2, HEIGHT / 2, n, KILL_COLORS)
+
+def best_of(fn, repeat):
+    # Best-of timing in microseconds
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot size and speed benchmark")
+    parser.add_argument('--counts', type=int, nargs='+', default=[0, 10, 50, 100, 250, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"{'entities':>8} {'bytes':>9} {'save us':>9} {'load us':>9}")
+    for n in args.counts:
+        world = World(seed=1)
+        populate(world, n)
+        data = world.snapshot()
+        target = World(seed=2)
+        save_us = best_of(world.snapshot, args.repeat)
+        load_us = best_of(lambda: target.restore(data), args.repeat)
+        print(f"{n:>8} {len(data):>9} {save_us:>9.1f} {load_us:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Throughput of the batch environment against worker count.
+#
+#   python -m benchmarks.bench_vec_env --envs 64 --steps 500
+#
+# Reports game ticks per second for VecEnv in-process and for ProcessVecEnv
+# at 1, 2, 4, ... workers up to the core count, with random actions.
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+from vec_env import ProcessVecEnv, VecEnv
+
+def measure(env, steps, rng):
+    env.reset(range(env.num_envs))
+    actions = rng.integers(0, 32, (steps, env.num_envs), dtype=np.uint8)
+    start = time.perf_counter()
+    for i in range(steps):
+        env.step(actions[i])
+    return env.num_envs * steps / (time.perf_counter() - start)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VecEnv throughput benchmark")
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=500)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    base = measure(VecEnv(args.envs), args.steps, rng)
+    print(f"{'workers':>8} {'ticks/s':>10} {'speedup':>8}")
+    print(f"{'inproc':>8} {base:>10.0f} {1.0:>8.2f}")
+
+    workers = 1
+    cores = multiprocessing.cpu_count()
+    while workers <= cores:
+        with ProcessVecEnv(args.envs, workers) as env:
+            rate = measure(env, args.steps, rng)
+        print(f"{workers:>8} {rate:>10.0f} {rate / base:>8.2f}")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
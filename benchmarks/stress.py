@@ -0,0 +1,223 @@
+# Stress-scenario benchmark suite.
+#
+#   python -m benchmarks.stress --output results.json
+#   python -m benchmarks.stress --baseline results.json --tolerance 0.15
+#
+# Each scenario builds an extreme situation straight from the game's
+# entities, then times World.step() and Renderer.draw() (to an offscreen
+# surface) per tick and reports p50/p95/p99 in milliseconds. With
+# --baseline, the run fails (exit 1) when any scenario's p95 regresses by
+# more than --tolerance relative to the saved results.
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from space_defender import (
+    BULLET_PATTERNS, FPS, HEIGHT, INPUT_FIRE, INPUT_LEFT, INPUT_RIGHT, KILL_COLORS, WIDTH,
+    Boss, Enemy, Renderer, World, spawn_bullet,
+)
+from patterns import Emitter
+
+def invulnerable(world):
+    world.player.health = world.player.max_health = 10 ** 9
+
+def wave20(world):
+    # Late-game spawn rate: max(20, 40 - wave * 2) bottoms out at 20 ticks
+    world.wave = 20
+    world.kills_this_wave = -10 ** 9
+    for _ in range(40):
+        e = Enemy(world.rng.choice(['normal', 'fast', 'tank']), world.rng)
+        e.y = world.rng.uniform(0, HEIGHT - 150)
+        world.enemies.append(e)
+
+def weapon3_rapid_fire(world):
+    world.player.weapon_level = 3
+    world.rapid_fire_timer = 10 ** 9
+    world.wave = 4
+    for _ in range(300):
+        spawn_bullet(world.bullets, world.rng.uniform(0, WIDTH), world.rng.uniform(0, HEIGHT))
+    for _ in range(30):
+        e = Enemy('tank', world.rng)
+        e.y = world.rng.uniform(0, HEIGHT / 2)
+        e.health = 10 ** 6
+        world.enemies.append(e)
+
+def boss_phase2(world):
+    world.wave = 5
+    boss = world.boss = Boss()
+    world.boss_active = True
+    boss.y = 80
+    boss.health = boss.max_health = 10 ** 6
+    boss.phase = 2
+    # Fill the screen with triple shots from across the boss's sweep
+    for x in range(0, WIDTH - boss.w, 8):
+        for y in range(0, 400, 40):
+            boss.x, boss.y = x, 80 - y
+            boss.shoot(world.enemy_bullets)
+    boss.x, boss.y = WIDTH // 2 - 50, 80
+
+def boss_storm(world):
+    # The densest pattern on every phase 2 volley: 144 bullets every 20 ticks
+    boss_phase2(world)
+    world.boss.emitters[2] = [Emitter(BULLET_PATTERNS['storm'])]
+
+def swarm500(world):
+    # 500 flocking fast enemies over the top half of the screen
+    world.kills_this_wave = -10 ** 9
+    for _ in range(500):
+        e = Enemy('fast', world.rng)
+        e.behavior = 'flock'
+        e.y = world.rng.uniform(-HEIGHT / 2, HEIGHT / 2)
+        e.health = 10 ** 6
+        world.enemies.append(e)
+
+def refill_swarm(world):
+    for e in world.enemies:
+        if e.y > HEIGHT - 60:
+            e.y = e.py = -e.h
+
+def particles2000(world):
+    for _ in range(100):
+        world.burst(world.rng.uniform(0, WIDTH), world.rng.uniform(0, HEIGHT), 20, KILL_COLORS)
+
+def refill_particles(world):
+    missing = 2000 - len(world.particles)
+    if missing > 0:
+        world.burst(world.rng.uniform(0, WIDTH), world.rng.uniform(0, HEIGHT), missing, KILL_COLORS)
+
+def refill_bullets(world):
+    while len(world.bullets) < 300:
+        spawn_bullet(world.bullets, world.rng.uniform(0, WIDTH), HEIGHT - 1)
+
+def respray_boss(world):
+    boss = world.boss
+    if boss and len(world.enemy_bullets) < 300:
+        boss.shoot(world.enemy_bullets)
+
+SCENARIOS = {
+    # name: (setup, per-tick hook)
+    'wave20_spawns': (wave20, None),
+    'weapon3_rapid_fire': (weapon3_rapid_fire, refill_bullets),
+    'boss_phase2_barrage': (boss_phase2, respray_boss),
+    'boss_storm_pattern': (boss_storm, None),
+    'particles_2000': (particles2000, refill_particles),
+    'swarm_500': (swarm500, refill_swarm),
+}
+
+def percentiles(samples):
+    ms = np.array(samples) * 1000
+    return {
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'p99': float(np.percentile(ms, 99)),
+        'mean': float(ms.mean()),
+    }
+
+def run_scenario(name, ticks, warmup, render):
+    setup, hook = SCENARIOS[name]
+    world = World(seed=1)
+    invulnerable(world)
+    setup(world)
+    renderer = Renderer() if render else None
+    surface = pygame.Surface((WIDTH, HEIGHT))
+
+    sim, draw = [], []
+    entities = []
+    for tick in range(warmup + ticks):
+        # Sweep side to side with the trigger held
+        inputs = INPUT_FIRE | (INPUT_LEFT if (tick // FPS) % 2 else INPUT_RIGHT)
+        if hook:
+            hook(world)
+        invulnerable(world)
+
+        start = time.perf_counter()
+        world.step(inputs)
+        mid = time.perf_counter()
+        if renderer:
+            renderer.draw(surface, world)
+        end = time.perf_counter()
+
+        if tick >= warmup:
+            sim.append(mid - start)
+            draw.append(end - mid)
+            entities.append(len(world.enemies) + len(world.bullets) + len(world.enemy_bullets)
+                            + len(world.particles) + len(world.powerups))
+
+    result = {'sim': percentiles(sim), 'entities_mean': float(np.mean(entities))}
+    if renderer:
+        result['render'] = percentiles(draw)
+    return result
+
+def compare(results, baseline, tolerance):
+    # Returns a list of regression messages
+    failures = []
+    for name, result in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        for phase in ('sim', 'render'):
+            if phase not in result or phase not in old:
+                continue
+            new_p95, old_p95 = result[phase]['p95'], old[phase]['p95']
+            if old_p95 > 0 and new_p95 > old_p95 * (1 + tolerance):
+                failures.append(f"{name} {phase} p95 {old_p95:.3f} -> {new_p95:.3f} ms "
+                                f"(+{(new_p95 / old_p95 - 1) * 100:.0f}%)")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Space Defender stress benchmarks")
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="run only this scenario (repeatable)")
+    parser.add_argument('--no-render', action='store_true', help="time the simulation only")
+    parser.add_argument('--output', metavar='PATH', help="write results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="compare against earlier results")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="allowed p95 slowdown against the baseline (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'ticks': args.ticks,
+        },
+        'scenarios': {},
+    }
+    print(f"{'scenario':<22} {'phase':<7} {'p50':>8} {'p95':>8} {'p99':>8}  ms")
+    for name in args.scenario or SCENARIOS:
+        result = run_scenario(name, args.ticks, args.warmup, not args.no_render)
+        results['scenarios'][name] = result
+        for phase in ('sim', 'render'):
+            if phase in result:
+                r = result[phase]
+                print(f"{name:<22} {phase:<7} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['p99']:>8.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
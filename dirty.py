@@ -0,0 +1,81 @@
+import numpy as np
+import pygame
+
+class DirtyRectTracker:
+    # Tracks which parts of the screen changed between frames on a coarse
+    # tile grid. Rects drawn this frame are marked on the grid; the regions
+    # to present are the tiles drawn this frame plus the tiles drawn last
+    # frame (which have been erased), merged into row runs and then into
+    # taller blocks. When the dirty area passes full_threshold (a fraction
+    # of the screen) a full-frame update is cheaper and None is returned.
+    def __init__(self, size, tile=32, full_threshold=0.5):
+        self.width, self.height = size
+        self.tile = tile
+        self.full_threshold = full_threshold
+        self.cols = -(-self.width // tile)
+        self.rows = -(-self.height // tile)
+        self.prev = np.ones((self.rows, self.cols), bool)
+        self.full_frames = 0
+        self.partial_frames = 0
+
+    def invalidate(self):
+        # Forces the next frame to be erased and presented in full
+        self.prev[:] = True
+
+    def erase_regions(self):
+        # Regions that held last frame's drawing, or None to clear everything
+        if self.prev.mean() > self.full_threshold:
+            return None
+        return self.regions(self.prev)
+
+    def mark(self, rects):
+        mask = np.zeros((self.rows, self.cols), bool)
+        tile = self.tile
+        cols, rows = self.cols, self.rows
+        for r in rects:
+            if r.width <= 0 or r.height <= 0:
+                continue
+            x0 = max(0, r.left // tile)
+            y0 = max(0, r.top // tile)
+            x1 = min(cols, (r.right - 1) // tile + 1)
+            y1 = min(rows, (r.bottom - 1) // tile + 1)
+            if x0 < x1 and y0 < y1:
+                mask[y0:y1, x0:x1] = True
+        return mask
+
+    def present(self, rects):
+        # Returns the rects to pass to pygame.display.update(), or None for a
+        # full-frame update
+        cur = self.mark(rects)
+        dirty = cur | self.prev
+        self.prev = cur
+        if dirty.mean() > self.full_threshold:
+            self.full_frames += 1
+            return None
+        self.partial_frames += 1
+        return self.regions(dirty)
+
+    def regions(self, mask):
+        tile = self.tile
+        out = []
+        # Open blocks keyed by their (start, end) column run on the row above
+        open_blocks = {}
+        for y in range(self.rows):
+            row = mask[y]
+            runs = {}
+            if row.any():
+                padded = np.concatenate(([False], row, [False]))
+                edges = np.flatnonzero(padded[1:] != padded[:-1])
+                for start, end in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+                    block = open_blocks.pop((start, end), None)
+                    if block is None:
+                        block = [start, y, end - start, 0]
+                    block[3] += 1
+                    runs[(start, end)] = block
+            out.extend(open_blocks.values())
+            open_blocks = runs
+        out.extend(open_blocks.values())
+
+        width, height = self.width, self.height
+        return [pygame.Rect(x * tile, y * tile, w * tile, h * tile).clip((0, 0, width, height))
+                for x, y, w, h in out]
@@ -0,0 +1,244 @@
+# Renders an input recording to video frames faster than real time.
+#
+#   python export.py session.sdr --png frames/
+#   python export.py session.sdr --video clip.mp4 --start 1200 --end 2400
+#
+# The recording is replayed headless and every tick from --start to --end
+# is drawn to an offscreen surface. The main thread only simulates and
+# draws; raw RGB frames go through a bounded queue to encoder threads, so
+# drawing the next frame overlaps encoding the last ones and a slow encoder
+# holds rendering back instead of piling frames up in memory. Encoders:
+#   --png DIR     numbered PNGs written by --workers threads (zlib releases
+#                 the GIL while it compresses, so they run in parallel)
+#   --video PATH  raw frames piped to ffmpeg, which encodes in its own
+#                 process
+#
+# PNG output, big-endian as the format requires:
+#   signature, then chunks of (u32 length, 4-byte type, data, u32 crc32)
+#   IHDR  u32 width, u32 height, u8 depth 8, u8 colour type 2 (RGB), 0, 0, 0
+#   IDAT  zlib stream of rows, each a filter byte 1 (Sub) and the row's
+#         bytes minus the pixel to their left
+#   IEND  empty
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+import pygame
+
+from recording import RecordingError, load_recording
+from space_defender import FPS, HEIGHT, WIDTH, Renderer, World, init_pygame, load_atlas
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IHDR = struct.Struct('>IIBBBBB')
+CHUNK_HEADER = struct.Struct('>I4s')
+CRC = struct.Struct('>I')
+FILTER_SUB = 1
+
+class ExportError(Exception):
+    pass
+
+def png_chunk(kind, data):
+    return CHUNK_HEADER.pack(len(data), kind) + data + CRC.pack(zlib.crc32(data, zlib.crc32(kind)))
+
+def encode_png(rgb, width, height, level=1):
+    rows = np.frombuffer(rgb, np.uint8).reshape(height, width * 3)
+    filtered = np.empty((height, width * 3 + 1), np.uint8)
+    filtered[:, 0] = FILTER_SUB
+    filtered[:, 1:4] = rows[:, :3]
+    np.subtract(rows[:, 3:], rows[:, :-3], out=filtered[:, 4:])
+    return b''.join((
+        PNG_SIGNATURE,
+        png_chunk(b'IHDR', IHDR.pack(width, height, 8, 2, 0, 0, 0)),
+        png_chunk(b'IDAT', zlib.compress(filtered.tobytes(), level)),
+        png_chunk(b'IEND', b''),
+    ))
+
+class PngSequence:
+    # frame_000000.png, frame_000001.png, ... in `directory`. Each frame is
+    # its own file, so any number of workers can write them out of order.
+    parallel = True
+
+    def __init__(self, directory, size, level=1):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.size = size
+        self.level = level
+
+    def write(self, index, rgb):
+        path = os.path.join(self.directory, f"frame_{index:06d}.png")
+        with open(path, 'wb') as f:
+            f.write(encode_png(rgb, *self.size, self.level))
+
+    def close(self):
+        pass
+
+class PipeEncoder:
+    # Raw rgb24 frames in order to an encoder process's stdin; ffmpeg by
+    # default. One worker, as the pipe is a single ordered stream.
+    parallel = False
+
+    def __init__(self, path, size, fps=FPS, ffmpeg='ffmpeg'):
+        command = [ffmpeg, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f"{size[0]}x{size[1]}", '-r', str(fps),
+                   '-i', '-', '-pix_fmt', 'yuv420p', path]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except OSError as e:
+            raise ExportError(f"can't start {ffmpeg}: {e}")
+
+    def write(self, index, rgb):
+        try:
+            self.process.stdin.write(rgb)
+        except BrokenPipeError:
+            raise ExportError(f"encoder exited with status {self.process.wait()}")
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.wait():
+            raise ExportError(f"encoder exited with status {self.process.returncode}")
+
+class FrameQueue:
+    # Bounded hand-off from the render thread to the encoder workers.
+    # put() blocks while `size` frames are waiting, and the time it spends
+    # blocked is the encoders holding rendering back. A worker that fails
+    # keeps draining the queue so put() can't hang; the error is raised on
+    # the render thread at its next put() or at finish().
+    def __init__(self, encoder, workers=1, size=8):
+        self.encoder = encoder
+        self.queue = queue.Queue(maxsize=size)
+        self.error = None
+        self.stalled = 0.0
+        count = workers if encoder.parallel else 1
+        self.threads = [threading.Thread(target=self.work, name=f'encoder-{i}', daemon=True)
+                        for i in range(count)]
+        for thread in self.threads:
+            thread.start()
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                try:
+                    self.encoder.write(*item)
+                except BaseException as e:
+                    self.error = e
+
+    def put(self, index, rgb):
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+        self.queue.put((index, rgb))
+        self.stalled += time.perf_counter() - start
+
+    def finish(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        try:
+            self.encoder.close()
+        finally:
+            if self.error is not None:
+                raise self.error
+
+def export(recording, encoder, workers=1, start=0, end=None, queue_size=8):
+    # Replays `recording`, drawing and queueing ticks start..end (end
+    # exclusive, None for the whole run). Returns the world and timings.
+    end = recording.ticks if end is None else min(end, recording.ticks)
+    world = World(recording.seed)
+    renderer = Renderer(load_atlas())
+    # Stars scroll with game time, not with however fast the export runs
+    renderer.clock = lambda: world.tick * 1000 // FPS
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    frames = FrameQueue(encoder, workers, queue_size)
+
+    began = time.perf_counter()
+    render = 0.0
+    index = 0
+    try:
+        for tick, inputs in enumerate(recording.inputs()):
+            if tick >= end:
+                break
+            world.step(inputs)
+            if tick < start:
+                continue
+            t = time.perf_counter()
+            renderer.draw(surface, world)
+            rgb = pygame.image.tobytes(surface, 'RGB')
+            render += time.perf_counter() - t
+            frames.put(index, rgb)
+            index += 1
+    finally:
+        frames.finish()
+    return world, {
+        'frames': index,
+        'ticks': end,
+        'elapsed': time.perf_counter() - began,
+        'render': render,
+        'stalled': frames.stalled,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a Space Defender recording as video frames")
+    parser.add_argument('path', metavar='RECORDING')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--png', metavar='DIR', help="write a numbered PNG sequence into DIR")
+    output.add_argument('--video', metavar='PATH', help="encode to PATH with ffmpeg")
+    parser.add_argument('--start', type=int, default=0, metavar='TICK', help="first tick to export")
+    parser.add_argument('--end', type=int, metavar='TICK', help="tick to stop before (default: the end)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="PNG encoder threads")
+    parser.add_argument('--queue', type=int, default=8, metavar='FRAMES',
+                        help="frames that may wait for an encoder before rendering blocks")
+    parser.add_argument('--level', type=int, default=1, choices=range(10), metavar='0-9',
+                        help="PNG compression level")
+    parser.add_argument('--ffmpeg', default='ffmpeg', metavar='PATH', help="ffmpeg executable")
+    args = parser.parse_args(argv)
+
+    try:
+        recording = load_recording(args.path)
+    except (OSError, RecordingError) as e:
+        print(f"{args.path}: {e}")
+        return 1
+
+    init_pygame()
+    size = (WIDTH, HEIGHT)
+    try:
+        if args.png:
+            encoder = PngSequence(args.png, size, args.level)
+        else:
+            encoder = PipeEncoder(args.video, size, FPS, args.ffmpeg)
+        world, stats = export(recording, encoder, max(1, args.workers), args.start, args.end,
+                              max(1, args.queue))
+    except (OSError, ExportError) as e:
+        print(f"export failed: {e}")
+        return 1
+
+    frames, elapsed = stats['frames'], stats['elapsed']
+    print(f"{frames} frames in {elapsed:.2f} s: {frames / elapsed if elapsed else 0:.1f} fps "
+          f"({frames / elapsed / FPS if elapsed else 0:.1f}x real time)")
+    if frames:
+        print(f"  render  {stats['render'] / frames * 1000:6.2f} ms/frame")
+    print(f"  waiting on encoders {stats['stalled']:.2f} s")
+    if stats['ticks'] == recording.ticks:
+        ok = world.state_hash() == recording.state_hash
+        print(f"  replay {'OK' if ok else 'MISMATCH'} score={world.score} wave={world.wave}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import functools
+from collections import OrderedDict
+
+import pygame
+
+from viewport import line_width, scale_rect
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+CYAN = (0, 255, 255)
+PURPLE = (200, 0, 255)
+GOLD = (255, 215, 0)
+SHIELD_BACK = (0, 100, 150)
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, string, color), least recently
+    # used entries evicted first
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        entries = self.entries
+        surf = entries.get(key)
+        if surf is not None:
+            entries.move_to_end(key)
+            return surf
+        surf = font.render(text, True, color)
+        entries[key] = surf
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return surf
+
+class HudLine:
+    # One line of HUD text; the string is only rebuilt and looked up when
+    # the value it shows changes
+    def __init__(self, cache, font, fmt, color, pos):
+        self.cache = cache
+        self.font = font
+        self.fmt = fmt
+        self.color = color
+        self.pos = pos
+        self.value = None
+        self.surface = None
+
+    def draw(self, surface, value=None):
+        if self.surface is None or value != self.value:
+            self.value = value
+            self.surface = self.cache.render(self.font, self.fmt.format(value), self.color)
+        return surface.blit(self.surface, self.pos)
+
+@functools.lru_cache(maxsize=None)
+def load_font(size):
+    # Fonts are loaded on first use; the font module starts with the first one
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.Font(None, size)
+
+class Hud:
+    # Laid out in logical coordinates on a playfield of `size` and drawn at
+    # `scale`, text included. The game over screen lists up to `rows` of
+    # the best runs.
+    def __init__(self, size, scale=1, rows=5):
+        self.size = size
+        width, height = size
+        self.scale = scale
+        self.font = load_font(max(1, round(36 * scale)))
+        self.small_font = load_font(max(1, round(24 * scale)))
+        self.cache = TextCache()
+        font, small_font, cache = self.font, self.small_font, self.cache
+
+        def line(font, fmt, color, x, y):
+            return HudLine(cache, font, fmt, color, (int(x * scale), int(y * scale)))
+
+        self.score = line(small_font, "Score: {}", WHITE, 10, 10)
+        self.wave = line(small_font, "Wave: {}", WHITE, width - 120, 10)
+        self.combo = line(font, "x{} COMBO!", GOLD, width // 2 - 80, 50)
+        self.rapid_fire = line(small_font, "RAPID FIRE!", PURPLE, 10, 85)
+        self.boss = line(font, "BOSS BATTLE!", RED, width // 2 - 100, 10)
+
+        # Game over screen
+        self.game_over = line(font, "GAME OVER", RED, width // 2 - 100, height // 2 - 80)
+        self.final_score = line(font, "Final Score: {}", WHITE, width // 2 - 120, height // 2 - 30)
+        self.final_wave = line(small_font, "Reached Wave: {}", WHITE, width // 2 - 100, height // 2 + 10)
+        self.restart = line(small_font, "Press R to Restart", WHITE, width // 2 - 100, height // 2 + 50)
+        self.high_scores = line(small_font, "High Scores", GOLD, width // 2 - 100, height // 2 + 90)
+        self.score_rows = [line(small_font, "{}", WHITE, width // 2 - 100, height // 2 + 115 + i * 22)
+                           for i in range(rows)]
+        self.new_best = line(small_font, ">", GOLD, width // 2 - 120, 0)
+        self.top_runs = []
+        self.top_rank = None
+
+    def set_leaderboard(self, runs, rank=None):
+        # Best runs for the game over screen; `rank` marks this run's row
+        self.top_runs = runs
+        self.top_rank = rank
+
+    def draw(self, surface, world):
+        # Returns the rects drawn, for dirty-rect presentation
+        rects = [self.score.draw(surface, world.score),
+                 self.wave.draw(surface, world.wave)]
+
+        if world.combo > 1:
+            rects.append(self.combo.draw(surface, world.combo))
+
+        # Bars for player 1 on the left, player 2 on the right
+        width = self.size[0]
+        scale = self.scale
+        outline = line_width(2, scale)
+        for player, x in zip(world.players, (10, width - 210)):
+            # Health bar
+            health = max(0, min(player.health, player.max_health))
+            bar = scale_rect((x, 40, 200, 20), scale)
+            rects.append(pygame.draw.rect(surface, RED, bar))
+            pygame.draw.rect(surface, GREEN, scale_rect((x, 40, int(200 * health / player.max_health), 20), scale))
+            pygame.draw.rect(surface, WHITE, bar, outline)
+
+            # Shield bar
+            if player.shield > 0:
+                bar = scale_rect((x, 65, 200, 15), scale)
+                rects.append(pygame.draw.rect(surface, SHIELD_BACK, bar))
+                pygame.draw.rect(surface, CYAN, scale_rect((x, 65, int(200 * player.shield / player.max_shield), 15), scale))
+                pygame.draw.rect(surface, WHITE, bar, outline)
+
+        if world.rapid_fire_timer > 0:
+            rects.append(self.rapid_fire.draw(surface))
+
+        if world.boss_active:
+            rects.append(self.boss.draw(surface))
+
+        if world.game_over:
+            rects.append(self.game_over.draw(surface))
+            rects.append(self.final_score.draw(surface, world.score))
+            rects.append(self.final_wave.draw(surface, world.wave))
+            rects.append(self.restart.draw(surface))
+            if self.top_runs:
+                rects.append(self.high_scores.draw(surface))
+                for i, (line, run) in enumerate(zip(self.score_rows, self.top_runs)):
+                    rects.append(line.draw(surface, f"{i + 1}. {run.score}  wave {run.wave}"))
+                if self.top_rank is not None and self.top_rank < len(self.score_rows):
+                    self.new_best.pos = (self.new_best.pos[0], self.score_rows[self.top_rank].pos[1])
+                    rects.append(self.new_best.draw(surface))
+        return rects
@@ -0,0 +1,289 @@
+import argparse
+import bisect
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+# High-score store, all little-endian:
+#   runs.log  magic b'SDLB', u8 version, then one RECORD per finished run
+#             (i64 score, u32 wave, u32 ticks, u64 seed, f64 unix time,
+#             u32 CRC-32 of the rest). Append-only. A record that fails
+#             its CRC is skipped and counted; a torn final partial record
+#             is ignored, and cut off when the log is next opened for
+#             writing.
+#   top.idx   magic b'SDTK', u8 version, u32 K, u64 log records covered,
+#             u32 count, then up to K RECORDs, best first. Rewritten
+#             atomically after each batch, so opening the leaderboard reads
+#             the index and only the log records appended after it.
+#
+#   python leaderboard.py show [DIR] [-n 20]
+#   python leaderboard.py compact [DIR] [--keep 1000] [--older-than-days 30]
+LOG_MAGIC = b'SDLB'
+INDEX_MAGIC = b'SDTK'
+VERSION = 1
+HEADER = struct.Struct('<4sB')
+INDEX_HEADER = struct.Struct('<4sBIQI')
+RECORD = struct.Struct('<qIIQdI')
+
+# Where the game keeps its scores: beside the code, not the working directory
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scores')
+
+Run = namedtuple('Run', 'score wave ticks seed timestamp')
+
+class LeaderboardError(Exception):
+    pass
+
+def rank_key(run):
+    # Higher score first, then higher wave, then whoever got there first
+    return (-run.score, -run.wave, run.timestamp)
+
+def pack_run(run):
+    body = RECORD.pack(*run, 0)[:-4]
+    return body + struct.pack('<I', zlib.crc32(body))
+
+def read_runs(data, offset=HEADER.size):
+    # Yields each whole record from `offset` on: a Run, or None for one
+    # that fails its CRC. A partial record at the end is left out.
+    size = RECORD.size
+    for pos in range(offset, len(data) - size + 1, size):
+        *fields, crc = RECORD.unpack_from(data, pos)
+        if zlib.crc32(data[pos:pos + size - 4]) != crc:
+            yield None
+        else:
+            yield Run(*fields)
+
+class TopK:
+    def __init__(self, k):
+        self.k = k
+        self.runs = []
+        self.keys = []
+
+    def add(self, run):
+        # Returns the run's 0-based rank, or None if it didn't place
+        key = rank_key(run)
+        i = bisect.bisect_right(self.keys, key)
+        if i >= self.k:
+            return None
+        self.keys.insert(i, key)
+        self.runs.insert(i, run)
+        if len(self.runs) > self.k:
+            self.keys.pop()
+            self.runs.pop()
+        return i
+
+class Leaderboard:
+    # Runs are submitted from the game thread and written by a background
+    # thread in batches, one fsync per batch. A read-only leaderboard
+    # never writes or truncates anything and can't take submissions.
+    def __init__(self, directory, k=100, flush_interval=0.5, readonly=False):
+        self.directory = directory
+        self.log_path = os.path.join(directory, 'runs.log')
+        self.index_path = os.path.join(directory, 'top.idx')
+        self.k = k
+        self.flush_interval = flush_interval
+        self.readonly = readonly
+
+        self.lock = threading.Lock()
+        # durable: runs known to be in the log, which the index is written
+        # from; top also has submissions still waiting for the writer.
+        # records counts whole records in the log, corrupt ones included.
+        self.durable, self.records, self.corrupt = self.load()
+        self.top = TopK(k)
+        for run in self.durable.runs:
+            self.top.add(run)
+        if readonly:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        self.log = open(self.log_path, 'ab')
+        end = HEADER.size + self.records * RECORD.size
+        if self.log.tell() == 0:
+            self.log.write(HEADER.pack(LOG_MAGIC, VERSION))
+            self.log.flush()
+        elif self.log.tell() > end and (self.log.tell() - HEADER.size) % RECORD.size:
+            # A write torn partway through the last record; cut it off so
+            # new records stay aligned
+            self.log.truncate(end)
+            self.log.seek(0, os.SEEK_END)
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name='leaderboard-writer', daemon=True)
+        self.writer.start()
+
+    def load(self):
+        # (TopK, log record count, corrupt records skipped) from the index
+        # plus the log tail it doesn't cover
+        top = TopK(self.k)
+        covered = 0
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            magic, version, k, covered, count = INDEX_HEADER.unpack_from(data)
+            if magic != INDEX_MAGIC or version != VERSION:
+                raise LeaderboardError("bad index")
+            for i in range(count):
+                *fields, _ = RECORD.unpack_from(data, INDEX_HEADER.size + i * RECORD.size)
+                top.add(Run(*fields))
+            if k < self.k:
+                # Asked for more than the index kept; only a full scan can say
+                covered, top = 0, TopK(self.k)
+        except (OSError, struct.error, LeaderboardError):
+            covered, top = 0, TopK(self.k)
+
+        try:
+            with open(self.log_path, 'rb') as f:
+                header = f.read(HEADER.size)
+                if header and header != HEADER.pack(LOG_MAGIC, VERSION):
+                    raise LeaderboardError(f"{self.log_path} is not a leaderboard log")
+                if os.fstat(f.fileno()).st_size < HEADER.size + covered * RECORD.size:
+                    # The index is newer than the log; trust the log
+                    covered, top = 0, TopK(self.k)
+                f.seek(HEADER.size + covered * RECORD.size)
+                tail = f.read()
+        except FileNotFoundError:
+            return TopK(self.k), 0, 0
+        records = covered
+        corrupt = 0
+        for run in read_runs(tail, 0):
+            if run is None:
+                corrupt += 1
+            else:
+                top.add(run)
+            records += 1
+        return top, records, corrupt
+
+    def submit(self, score, wave, ticks, seed):
+        # Queues a finished run; returns its rank among the kept top K
+        # (0-based) or None. Never blocks on disk.
+        if self.readonly:
+            raise LeaderboardError("leaderboard is open read-only")
+        run = Run(score, wave, ticks, seed, time.time())
+        with self.lock:
+            rank = self.top.add(run)
+        self.queue.put(run)
+        return rank
+
+    def best(self, n=10):
+        with self.lock:
+            return list(self.top.runs[:n])
+
+    def write_loop(self):
+        while True:
+            run = self.queue.get()
+            if run is None:
+                return
+            batch = [run]
+            deadline = time.monotonic() + self.flush_interval
+            closing = False
+            # Gather whatever else arrives within the flush interval
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    run = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if run is None:
+                    closing = True
+                    break
+                batch.append(run)
+            self.write_batch(batch)
+            if closing:
+                return
+
+    def write_batch(self, batch):
+        self.log.write(b''.join(pack_run(run) for run in batch))
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        for run in batch:
+            self.durable.add(run)
+        self.records += len(batch)
+        self.write_index()
+
+    def write_index(self):
+        runs = self.durable.runs
+        data = INDEX_HEADER.pack(INDEX_MAGIC, VERSION, self.k, self.records, len(runs))
+        data += b''.join(pack_run(run) for run in runs)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    def close(self):
+        # Flushes queued runs and stops the writer
+        if self.readonly:
+            return
+        self.queue.put(None)
+        self.writer.join()
+        self.log.close()
+
+def compact(directory, keep=None, older_than=None, k=100):
+    # Rewrites runs.log keeping the best `keep` runs (k, the size of the
+    # top index, if not given) and, with `older_than`, every run newer
+    # than that many seconds. With neither, every run is kept. Corrupt
+    # records are dropped either way. Returns (records before, records
+    # after). Don't run it while a game has the leaderboard open.
+    log_path = os.path.join(directory, 'runs.log')
+    with open(log_path, 'rb') as f:
+        records = list(read_runs(f.read()))
+    runs = [run for run in records if run is not None]
+    if keep is None and older_than is None:
+        kept = runs
+    else:
+        protected = set(sorted(runs, key=rank_key)[:k if keep is None else keep])
+        cutoff = time.time() - older_than if older_than is not None else None
+        kept = [run for run in runs
+                if run in protected or (cutoff is not None and run.timestamp >= cutoff)]
+
+    tmp = log_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(LOG_MAGIC, VERSION))
+        f.write(b''.join(pack_run(run) for run in kept))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, log_path)
+    # Rebuild the index to match the new log
+    index_path = os.path.join(directory, 'top.idx')
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    board = Leaderboard(directory, k)
+    board.write_index()
+    board.close()
+    return len(records), len(kept)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Space Defender leaderboard")
+    sub = parser.add_subparsers(dest='command', required=True)
+    show = sub.add_parser('show', help="print the best runs")
+    show.add_argument('directory', nargs='?', default=DEFAULT_DIR)
+    show.add_argument('-n', type=int, default=10)
+    comp = sub.add_parser('compact', help="drop old runs outside the top from the log")
+    comp.add_argument('directory', nargs='?', default=DEFAULT_DIR)
+    comp.add_argument('--keep', type=int, default=None,
+                      help="keep the best N runs; with only --older-than-days the best 100 "
+                           "are kept, and with neither option every run is kept")
+    comp.add_argument('--older-than-days', type=float, default=None,
+                      help="drop runs older than this that aren't kept by rank")
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        board = Leaderboard(args.directory, readonly=True)
+        if board.corrupt:
+            print(f"skipped {board.corrupt} corrupt records in {board.log_path}")
+        for i, run in enumerate(board.best(args.n), 1):
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(run.timestamp))
+            print(f"{i:>3}. {run.score:>8}  wave {run.wave:>3}  {run.ticks / 60:7.1f}s  {when}  seed {run.seed}")
+        board.close()
+    else:
+        older = args.older_than_days * 86400 if args.older_than_days is not None else None
+        before, after = compact(args.directory, args.keep, older)
+        print(f"{before} runs -> {after}")
+
+if __name__ == "__main__":
+    main()
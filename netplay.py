@@ -0,0 +1,522 @@
+# Networked co-op. An authoritative server runs the World and clients send
+# it one input bitmask per tick over TCP:
+#
+#   python netplay.py server --players 2
+#   python netplay.py client [HOST]
+#
+# State goes out every tick as a delta against the last tick the client
+# acknowledged: only entities that appeared, disappeared, or no longer sit
+# where the client would extrapolate them from their last record. Records
+# carry positions quantized to 1/8 px and velocities to 1/64 px per tick,
+# so bullets and enemies moving in straight lines cost nothing until they
+# drift by more than DRIFT. Each client predicts its own player from its
+# inputs and reconciles when the server echoes the last input it applied.
+# Ticks on the wire count the server's steps since it started, not
+# World.tick, which a restart sets back to 0.
+#
+# Messages are framed as (u32 payload length, u8 type), little-endian:
+#   HELLO    client -> server, empty
+#   WELCOME  server -> client, u8 player index, u8 players, u64 seed
+#   INPUT    client -> server, u32 input seq, u8 mask, u32 acked tick
+#   STATE    server -> client, STATE_HEADER, then `removed` (u8 kind,
+#            u32 id) pairs and `changed` RECORDs
+import argparse
+import asyncio
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+from space_defender import (
+    BOSS_DEATH_COLORS, ENEMY_STYLES, FPS, HEIGHT, KILL_COLORS, POWERUP_TYPES, WIDTH,
+    Boss, PowerUp, World, blank_enemy, seed,
+)
+
+FRAME = struct.Struct('<IB')
+WELCOME = struct.Struct('<BBQ')
+INPUT = struct.Struct('<IBI')
+STATE_HEADER = struct.Struct('<IIIiHHiHBHH')
+REMOVED = struct.Struct('<BI')
+RECORD = struct.Struct('<BIhhhhii')
+
+MSG_HELLO, MSG_WELCOME, MSG_INPUT, MSG_STATE = 1, 2, 3, 4
+NO_TICK = 0xFFFFFFFF
+
+POS_SCALE = 8
+VEL_SCALE = 64
+# Largest extrapolation error, in position quanta, before a record is resent
+DRIFT = POS_SCALE
+# Views kept per client, two seconds' worth; a client whose ack falls
+# further behind than this gets full states until it catches up
+MAX_VIEWS = 2 * FPS
+
+K_PLAYER, K_ENEMY, K_POWERUP, K_BOSS, K_BULLET, K_ENEMY_BULLET = range(6)
+ENEMY_TYPES = list(ENEMY_STYLES)
+
+# Extra fields per kind, in the record's a and b slots:
+#   player  health, shield * 16 + weapon level
+#   enemy   type index, health
+#   powerup type index, 0
+#   boss    health, phase
+
+class ProtocolError(Exception):
+    pass
+
+def quantize(v, scale):
+    return int(max(-32768, min(32767, round(v * scale))))
+
+def predict(rec, tick):
+    # Quantized position of a record extrapolated to `tick`; integer maths
+    # so server and client agree exactly
+    x, y, vx, vy, _, _, t0 = rec
+    dt = tick - t0
+    return x + vx * dt * POS_SCALE // VEL_SCALE, y + vy * dt * POS_SCALE // VEL_SCALE
+
+def world_records(world):
+    # {(kind, id): (x, y, vx, vy, a, b)} for everything clients draw
+    out = {}
+    for i, p in enumerate(world.players):
+        out[(K_PLAYER, i)] = (quantize(p.x, POS_SCALE), quantize(p.y, POS_SCALE), 0, 0,
+                              p.health, p.shield * 16 + p.weapon_level)
+    for e in world.enemies:
+        out[(K_ENEMY, e.id)] = (quantize(e.x, POS_SCALE), quantize(e.y, POS_SCALE),
+                                quantize(e.x - e.px, VEL_SCALE), quantize(e.y - e.py, VEL_SCALE),
+                                ENEMY_TYPES.index(e.type), e.health)
+    for q in world.powerups:
+        out[(K_POWERUP, q.id)] = (quantize(q.x, POS_SCALE), quantize(q.y, POS_SCALE),
+                                  0, quantize(q.speed, VEL_SCALE), POWERUP_TYPES.index(q.type), 0)
+    boss = world.boss
+    if world.boss_active and boss:
+        out[(K_BOSS, boss.id)] = (quantize(boss.x, POS_SCALE), quantize(boss.y, POS_SCALE),
+                                  quantize(boss.x - boss.px, VEL_SCALE),
+                                  quantize(boss.y - boss.py, VEL_SCALE), boss.health, boss.phase)
+    for kind, pool in ((K_BULLET, world.bullets), (K_ENEMY_BULLET, world.enemy_bullets)):
+        n = pool.count
+        if not n:
+            continue
+        ids = (pool.id[:n] & 0xFFFFFFFF).tolist()
+        xs = np.clip(np.round(pool.x[:n] * POS_SCALE), -32768, 32767).astype(np.int64).tolist()
+        ys = np.clip(np.round(pool.y[:n] * POS_SCALE), -32768, 32767).astype(np.int64).tolist()
+        vxs = np.round(pool.vx[:n] * VEL_SCALE).astype(np.int64).tolist()
+        vys = np.round(pool.vy[:n] * VEL_SCALE).astype(np.int64).tolist()
+        for i, x, y, vx, vy in zip(ids, xs, ys, vxs, vys):
+            out[(kind, i)] = (x, y, vx, vy, 0, 0)
+    if world.game_over:
+        # Nothing moves until the restart, however long the ticks run on
+        out = {key: (x, y, 0, 0, a, b) for key, (x, y, _, _, a, b) in out.items()}
+    return out
+
+def diff(base, current, tick):
+    # Returns (removed keys, changed [(key, record)], view the client will
+    # hold once it applies them). A record is (x, y, vx, vy, a, b, t0).
+    view = {}
+    changed = []
+    for key, (x, y, vx, vy, a, b) in current.items():
+        old = base.get(key)
+        if old is not None and old[2:6] == (vx, vy, a, b):
+            px, py = predict(old, tick)
+            if abs(px - x) <= DRIFT and abs(py - y) <= DRIFT:
+                view[key] = old
+                continue
+        rec = (x, y, vx, vy, a, b, tick)
+        view[key] = rec
+        changed.append((key, rec))
+    removed = [key for key in base if key not in current]
+    return removed, changed, view
+
+def encode_state(world, tick, base_tick, input_seq, removed, changed):
+    flags = world.boss_active | world.game_over << 1
+    out = [STATE_HEADER.pack(tick, base_tick, input_seq, world.score, world.wave, world.combo,
+                             world.kills_this_wave, world.rapid_fire_timer, flags,
+                             len(removed), len(changed))]
+    out += [REMOVED.pack(kind, i) for kind, i in removed]
+    out += [RECORD.pack(kind, i, *rec[:6]) for (kind, i), rec in changed]
+    return b''.join(out)
+
+def decode_state(payload):
+    if len(payload) < STATE_HEADER.size:
+        raise ProtocolError("truncated state")
+    header = STATE_HEADER.unpack_from(payload)
+    n_removed, n_changed = header[-2:]
+    pos = STATE_HEADER.size
+    if len(payload) != pos + n_removed * REMOVED.size + n_changed * RECORD.size:
+        raise ProtocolError("state length mismatch")
+    removed = [REMOVED.unpack_from(payload, pos + i * REMOVED.size) for i in range(n_removed)]
+    pos += n_removed * REMOVED.size
+    changed = []
+    for i in range(n_changed):
+        kind, eid, *rec = RECORD.unpack_from(payload, pos + i * RECORD.size)
+        changed.append(((kind, eid), tuple(rec)))
+    return header, removed, changed
+
+async def read_message(reader):
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return kind, await reader.readexactly(length)
+
+def write_message(writer, kind, payload=b''):
+    writer.write(FRAME.pack(len(payload), kind) + payload)
+    return FRAME.size + len(payload)
+
+class RemotePlayer:
+    # Server-side state for one connected client
+    def __init__(self, index, writer):
+        self.index = index
+        self.writer = writer
+        self.inputs = deque()
+        self.mask = 0
+        self.input_seq = 0
+        self.acked = None
+        self.views = {}
+        self.connected = True
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+class NetServer:
+    # Runs `world` at FPS once `players` clients have joined. Each tick
+    # applies at most one queued input per client (repeating the last one
+    # when none arrived) and sends every client its own delta.
+    def __init__(self, world, host='127.0.0.1', port=7777, max_queue=4):
+        self.world = world
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.clients = []
+        self.handlers = set()
+        self.ready = asyncio.Event()
+        self.server = None
+        self.ticks = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        if len(self.clients) >= self.world.num_players:
+            writer.close()
+            return
+        client = None
+        try:
+            kind, _ = await read_message(reader)
+            if kind != MSG_HELLO:
+                raise ProtocolError("expected HELLO")
+            client = RemotePlayer(len(self.clients), writer)
+            self.clients.append(client)
+            client.bytes_out += write_message(writer, MSG_WELCOME, WELCOME.pack(
+                client.index, self.world.num_players, self.world.seed))
+            if len(self.clients) == self.world.num_players:
+                self.ready.set()
+            while True:
+                kind, payload = await read_message(reader)
+                client.bytes_in += FRAME.size + len(payload)
+                if kind == MSG_INPUT:
+                    seq, mask, ack = INPUT.unpack(payload)
+                    client.inputs.append((seq, mask))
+                    if ack != NO_TICK and (client.acked is None or ack > client.acked):
+                        client.acked = ack
+                        for tick in [t for t in client.views if t < ack]:
+                            del client.views[tick]
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError, struct.error):
+            pass
+        finally:
+            if client:
+                client.connected = False
+            writer.close()
+
+    def next_inputs(self):
+        masks = [0] * self.world.num_players
+        for client in self.clients:
+            if len(client.inputs) > self.max_queue:
+                # Client running ahead; drop the backlog to keep latency bounded
+                while len(client.inputs) > 1:
+                    client.inputs.popleft()
+            if client.inputs:
+                client.input_seq, client.mask = client.inputs.popleft()
+            masks[client.index] = client.mask if client.connected else 0
+        return masks
+
+    def broadcast(self):
+        world = self.world
+        tick = self.ticks
+        current = world_records(world)
+        for client in self.clients:
+            if not client.connected:
+                continue
+            base_tick = client.acked if client.acked in client.views else NO_TICK
+            removed, changed, view = diff(client.views.get(base_tick, {}), current, tick)
+            client.views[tick] = view
+            while len(client.views) > MAX_VIEWS:
+                del client.views[next(iter(client.views))]
+            payload = encode_state(world, tick, base_tick, client.input_seq, removed, changed)
+            client.bytes_out += write_message(client.writer, MSG_STATE, payload)
+
+    async def run(self, ticks=None):
+        # Ticks until every client has left, or for `ticks` ticks
+        await self.ready.wait()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        dt = 1.0 / FPS
+        while ticks is None or self.ticks < ticks:
+            if not any(c.connected for c in self.clients):
+                break
+            self.world.step(self.next_inputs())
+            self.ticks += 1
+            self.broadcast()
+            for client in self.clients:
+                if client.connected:
+                    try:
+                        await client.writer.drain()
+                    except ConnectionError:
+                        client.connected = False
+            await asyncio.sleep(max(0.0, start + self.ticks * dt - loop.time()))
+
+    async def close(self):
+        for client in self.clients:
+            client.writer.close()
+        # Closing the connections ends the handlers' reads; cancelling them
+        # instead trips a logging bug in asyncio.start_server on 3.11
+        if self.handlers:
+            await asyncio.wait(self.handlers, timeout=1)
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+class NetClient:
+    # Client side of the protocol. Holds the views the server may delta
+    # against, predicts the local player, and mirrors the latest state into
+    # a display-only World for the Renderer.
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.index = 0
+        self.world = None
+        self.views = {}
+        self.tick = None
+        self.header = None
+        self.received_at = 0.0
+
+        self.seq = 0
+        self.pending = deque()
+        self.sent_at = {}
+        self.rtts = []
+        self.corrections = 0
+        self.objects = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.states = 0
+
+    async def connect(self, host='127.0.0.1', port=7777):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.bytes_out += write_message(self.writer, MSG_HELLO)
+        kind, payload = await read_message(self.reader)
+        if kind != MSG_WELCOME:
+            raise ProtocolError("expected WELCOME")
+        self.index, players, seed = WELCOME.unpack(payload)
+        self.world = World(seed, players=players)
+
+    def send_input(self, mask):
+        # Sends this tick's input and applies it to the local player at once
+        self.seq += 1
+        ack = NO_TICK if self.tick is None else self.tick
+        self.bytes_out += write_message(self.writer, MSG_INPUT, INPUT.pack(self.seq, mask, ack))
+        self.sent_at[self.seq] = time.perf_counter()
+        self.pending.append((self.seq, mask))
+        player = self.world.players[self.index]
+        player.px, player.py = player.x, player.y
+        if player.health > 0 and not self.world.game_over:
+            player.move(mask)
+
+    async def receive(self):
+        # Applies state messages until the connection closes
+        try:
+            while True:
+                kind, payload = await read_message(self.reader)
+                self.bytes_in += FRAME.size + len(payload)
+                if kind == MSG_STATE:
+                    self.apply(*decode_state(payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def apply(self, header, removed, changed):
+        tick, base_tick, input_seq = header[:3]
+        if base_tick == NO_TICK:
+            base = {}
+        elif base_tick in self.views:
+            base = self.views[base_tick]
+        else:
+            raise ProtocolError(f"server sent a delta against unknown tick {base_tick}")
+        view = dict(base)
+        for key in removed:
+            view.pop(key, None)
+        for key, rec in changed:
+            view[key] = rec + (tick,)
+        self.views[tick] = view
+        # The server's base only moves forward, so older views are dead;
+        # after a full state, acks still in flight may name any of them
+        # back to the MAX_VIEWS the server keeps
+        oldest = tick - MAX_VIEWS if base_tick == NO_TICK else base_tick
+        for t in [t for t in self.views if t < oldest]:
+            del self.views[t]
+        self.tick = tick
+        self.header = header
+        self.received_at = time.perf_counter()
+        self.states += 1
+
+        sent = self.sent_at.pop(input_seq, None)
+        if sent is not None:
+            self.rtts.append(self.received_at - sent)
+            for seq in [s for s in self.sent_at if s < input_seq]:
+                del self.sent_at[seq]
+        self.reconcile(view, input_seq)
+
+    def reconcile(self, view, input_seq):
+        # Restart from the server's position for our player and replay the
+        # inputs it hasn't applied yet
+        rec = view.get((K_PLAYER, self.index))
+        if rec is None:
+            return
+        while self.pending and self.pending[0][0] <= input_seq:
+            self.pending.popleft()
+        player = self.world.players[self.index]
+        predicted = (player.x, player.y)
+        player.x, player.y = rec[0] // POS_SCALE, rec[1] // POS_SCALE
+        player.health = rec[4]
+        player.shield, player.weapon_level = divmod(rec[5], 16)
+        if player.health > 0:
+            for _, mask in self.pending:
+                player.move(mask)
+        if (player.x, player.y) != predicted:
+            self.corrections += 1
+
+    def sync_world(self):
+        # Mirrors the newest view into self.world, extrapolated to the
+        # current moment, ready for Renderer.draw()
+        world = self.world
+        if self.tick is None:
+            return
+        view = self.views[self.tick]
+        tick = self.tick + int((time.perf_counter() - self.received_at) * FPS)
+        (_, _, _, world.score, world.wave, world.combo, world.kills_this_wave,
+         world.rapid_fire_timer, flags, _, _) = self.header
+        world.boss_active = bool(flags & 1)
+        world.game_over = bool(flags & 2)
+        world.tick = tick
+
+        objects = self.objects
+        seen = set()
+        enemies, powerups = [], []
+        bullets = {K_BULLET: [], K_ENEMY_BULLET: []}
+        world.boss = None
+        for key, rec in view.items():
+            kind = key[0]
+            if kind == K_PLAYER:
+                if key[1] != self.index and key[1] < len(world.players):
+                    p = world.players[key[1]]
+                    p.px, p.py = p.x, p.y
+                    p.x, p.y = rec[0] // POS_SCALE, rec[1] // POS_SCALE
+                    p.health = rec[4]
+                    p.shield, p.weapon_level = divmod(rec[5], 16)
+                continue
+            x, y = predict(rec, tick)
+            x, y = x / POS_SCALE, y / POS_SCALE
+            if kind in bullets:
+                bullets[kind].append((x, y))
+                continue
+            seen.add(key)
+            obj = objects.get(key)
+            if obj is None:
+                if kind == K_ENEMY:
+                    obj = blank_enemy(ENEMY_TYPES[rec[4]])
+                    obj.max_health = obj.health = rec[5]
+                elif kind == K_POWERUP:
+                    obj = PowerUp(x, y, POWERUP_TYPES[rec[4]])
+                else:
+                    obj = Boss()
+                obj.x, obj.y = x, y
+                objects[key] = obj
+            obj.px, obj.py = obj.x, obj.y
+            obj.x, obj.y = x, y
+            if kind == K_ENEMY:
+                obj.health = rec[5]
+                enemies.append(obj)
+            elif kind == K_POWERUP:
+                powerups.append(obj)
+            else:
+                obj.health, obj.phase = rec[4], rec[5]
+                world.boss = obj
+
+        # Explosions are cosmetic, so clients make their own where
+        # on-screen enemies and bosses vanish
+        for key in [k for k in objects if k not in seen]:
+            obj = objects.pop(key)
+            if key[0] in (K_ENEMY, K_BOSS) and 0 <= obj.y < HEIGHT:
+                world.burst(obj.x + obj.w // 2, obj.y + obj.h // 2, 20 if key[0] == K_ENEMY else 50,
+                            KILL_COLORS if key[0] == K_ENEMY else BOSS_DEATH_COLORS)
+        world.enemies = enemies
+        world.powerups = powerups
+        for kind, pool in ((K_BULLET, world.bullets), (K_ENEMY_BULLET, world.enemy_bullets)):
+            pool.clear()
+            if bullets[kind]:
+                xs, ys = zip(*bullets[kind])
+                pool.spawn_many(np.array(xs), np.array(ys))
+        world.particles.update()
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+async def run_server(args):
+    world = World(args.seed, players=args.players)
+    server = NetServer(world, args.host, args.port)
+    await server.start()
+    print(f"listening on {args.host}:{server.port} for {args.players} players")
+    await server.run()
+    await server.close()
+
+async def run_client(args):
+    import pygame
+
+    from space_defender import Renderer, init_pygame, load_atlas, read_inputs
+
+    client = NetClient()
+    await client.connect(args.host, args.port)
+    init_pygame()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Space Defender - Player {client.index + 1}")
+    renderer = Renderer(load_atlas())
+    clock = pygame.time.Clock()
+    receiver = asyncio.ensure_future(client.receive())
+
+    running = True
+    while running and not receiver.done():
+        clock.tick(FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        client.send_input(read_inputs(pygame.key.get_pressed()))
+        client.sync_world()
+        renderer.draw(screen, client.world)
+        pygame.display.flip()
+        await asyncio.sleep(0)
+
+    client.close()
+    receiver.cancel()
+    pygame.quit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Space Defender co-op over TCP")
+    sub = parser.add_subparsers(dest='mode', required=True)
+    server = sub.add_parser('server', help="host a game")
+    server.add_argument('--host', default='0.0.0.0')
+    server.add_argument('--port', type=int, default=7777)
+    server.add_argument('--players', type=int, default=2)
+    server.add_argument('--seed', type=seed, default=None)
+    client = sub.add_parser('client', help="join a game")
+    client.add_argument('host', nargs='?', default='127.0.0.1')
+    client.add_argument('--port', type=int, default=7777)
+    args = parser.parse_args(argv)
+    asyncio.run(run_server(args) if args.mode == 'server' else run_client(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import time
+
+class FixedTimestep:
+    # Accumulator loop driver: the simulation advances in fixed ticks while
+    # frames render at whatever rate the display allows. Call advance() once
+    # per frame to learn how many ticks to run, then render with alpha, the
+    # fraction of a tick left in the accumulator, to interpolate positions.
+    # At most max_steps ticks run per frame; time beyond that is dropped so
+    # a slow frame can't snowball into ever longer catch-up (spiral of death).
+    def __init__(self, tick_rate=60, max_steps=5, target_fps=None, clock=time.perf_counter):
+        self.dt = 1.0 / tick_rate
+        self.max_steps = max_steps
+        # Frames longer than 1.5 target intervals count as dropped
+        self.frame_budget = 1.5 / (target_fps or tick_rate)
+        self.clock = clock
+        self.last = None
+        self.accumulator = 0.0
+        self.alpha = 1.0
+
+        self.frames = 0
+        self.ticks = 0
+        self.late_ticks = 0
+        self.dropped_ticks = 0
+        self.dropped_frames = 0
+        self.worst_frame = 0.0
+        self.total_time = 0.0
+
+    def advance(self):
+        now = self.clock()
+        if self.last is None:
+            # First frame runs exactly one tick
+            self.last = now
+            self.frames += 1
+            self.ticks += 1
+            return 1
+        elapsed = now - self.last
+        self.last = now
+
+        self.frames += 1
+        self.total_time += elapsed
+        self.worst_frame = max(self.worst_frame, elapsed)
+        if elapsed > self.frame_budget:
+            self.dropped_frames += 1
+
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped_ticks += steps - self.max_steps
+            self.accumulator -= (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+        if steps > 1:
+            # Ticks run behind schedule to catch up
+            self.late_ticks += steps - 1
+        self.accumulator -= steps * self.dt
+        self.ticks += steps
+        self.alpha = min(1.0, self.accumulator / self.dt)
+        return steps
+
+    def stats(self):
+        frames = max(1, self.frames)
+        return {
+            'frames': self.frames,
+            'ticks': self.ticks,
+            'late_ticks': self.late_ticks,
+            'dropped_ticks': self.dropped_ticks,
+            'dropped_frames': self.dropped_frames,
+            'avg_fps': self.frames / self.total_time if self.total_time else 0.0,
+            'avg_frame_ms': self.total_time / frames * 1000,
+            'worst_frame_ms': self.worst_frame * 1000,
+        }
@@ -0,0 +1,109 @@
+import numpy as np
+import pygame
+
+class ParticleSystem:
+    # Fixed-budget particle store. Slots are handed out round-robin from a
+    # ring buffer, and every particle has the same lifetime, so once the
+    # budget is exceeded new particles overwrite the oldest live ones.
+    def __init__(self, budget=2048, size_decay=0.1, min_size=1):
+        self.budget = budget
+        self.size_decay = size_decay
+        self.min_size = min_size
+        self.cursor = 0
+
+        self.x = np.zeros(budget)
+        self.y = np.zeros(budget)
+        self.px = np.zeros(budget)
+        self.py = np.zeros(budget)
+        self.vx = np.zeros(budget)
+        self.vy = np.zeros(budget)
+        self.life = np.zeros(budget)
+        self.size = np.zeros(budget)
+        self.color = np.zeros((budget, 3), np.uint8)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.life > 0))
+
+    def clear(self):
+        self.life[:] = 0
+        self.cursor = 0
+
+    def spawn_many(self, x, y, vx, vy, life, size, color):
+        n = max(np.size(a) for a in (x, y, vx, vy, life, size))
+        if n == 0:
+            return
+        budget = self.budget
+        if n > budget:
+            # Only the newest `budget` particles of an oversized burst survive
+            keep = slice(n - budget, n)
+            x, y, vx, vy, life, size, color = (
+                a[keep] if np.ndim(a) and len(a) == n else a
+                for a in (x, y, vx, vy, life, size, color))
+            n = budget
+        slots = (self.cursor + np.arange(n)) % budget
+        self.x[slots] = self.px[slots] = x
+        self.y[slots] = self.py[slots] = y
+        self.vx[slots] = vx
+        self.vy[slots] = vy
+        self.life[slots] = life
+        self.size[slots] = size
+        self.color[slots] = color
+        self.cursor = (self.cursor + n) % budget
+
+    def update(self):
+        # Dead slots keep drifting harmlessly; updating the whole buffer is
+        # cheaper than masking it
+        self.px[:] = self.x
+        self.py[:] = self.y
+        self.x += self.vx
+        self.y += self.vy
+        self.life -= 1
+        np.maximum(self.size - self.size_decay, self.min_size, out=self.size)
+
+    def live(self):
+        return np.flatnonzero(self.life > 0)
+
+class ParticleRenderer:
+    # Draws particles as pre-rendered dot sprites, one cached Surface per
+    # (color, radius), submitted to the target with a single Surface.blits.
+    # Positions and sizes are logical and drawn at `scale`.
+    def __init__(self, scale=1):
+        self.scale = scale
+        self.sprites = {}
+
+    def sprite(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            radius = key & 0xFF
+            rgb = key >> 8
+            color = ((rgb >> 16) & 0xFF, (rgb >> 8) & 0xFF, rgb & 0xFF)
+            sprite = pygame.Surface((radius * 2, radius * 2))
+            sprite.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            self.sprites[key] = sprite
+        return sprite
+
+    def draw(self, surface, particles, alpha=1.0):
+        idx = particles.live()
+        if len(idx) == 0:
+            return []
+        x = particles.x[idx]
+        y = particles.y[idx]
+        if alpha != 1.0:
+            px = particles.px[idx]
+            py = particles.py[idx]
+            x = px + (x - px) * alpha
+            y = py + (y - py) * alpha
+        radius = particles.size[idx]
+        if self.scale != 1:
+            x = x * self.scale
+            y = y * self.scale
+            radius = np.maximum(radius * self.scale, 1)
+        radius = radius.astype(np.int64)
+        color = particles.color[idx].astype(np.int64)
+        keys = (((color[:, 0] << 16) | (color[:, 1] << 8) | color[:, 2]) << 8) | radius
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sprites = [self.sprite(k) for k in unique.tolist()]
+        left = (x.astype(np.int64) - radius).tolist()
+        top = (y.astype(np.int64) - radius).tolist()
+        return surface.blits((sprites[k], (l, t)) for k, l, t in zip(inverse.tolist(), left, top))
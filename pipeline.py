@@ -0,0 +1,184 @@
+import threading
+import time
+
+import numpy as np
+
+from pacing import FixedTimestep
+
+class PoolView:
+    # Positions of an EntityPool's live slots, copied into buffers that are
+    # reused from frame to frame
+    FIELDS = ('x', 'y', 'px', 'py')
+
+    def __init__(self):
+        self.count = 0
+        for name in self.FIELDS:
+            setattr(self, name, np.empty(0))
+
+    def __len__(self):
+        return self.count
+
+    def capture(self, pool):
+        n = pool.count
+        if len(self.x) < n:
+            for name in self.FIELDS:
+                setattr(self, name, np.empty(max(n, 2 * len(self.x))))
+        for name in self.FIELDS:
+            getattr(self, name)[:n] = getattr(pool, name)[:n]
+        self.count = n
+
+class ParticleView:
+    # A ParticleSystem's live particles packed to the front, with the
+    # live() and field access ParticleRenderer.draw needs
+    FIELDS = ('x', 'y', 'px', 'py', 'size', 'color')
+
+    def __init__(self):
+        self.count = 0
+        self.index = np.arange(0)
+
+    def __len__(self):
+        return self.count
+
+    def capture(self, particles):
+        if len(self.index) != particles.budget:
+            for name in self.FIELDS:
+                setattr(self, name, np.empty_like(getattr(particles, name)))
+            self.index = np.arange(particles.budget)
+        live = particles.live()
+        n = len(live)
+        for name in self.FIELDS:
+            np.take(getattr(particles, name), live, axis=0, out=getattr(self, name)[:n])
+        self.count = n
+
+    def live(self):
+        return self.index[:self.count]
+
+def copy_entity(e):
+    # Shallow copy of a __slots__ entity without copy.copy's dispatch
+    c = object.__new__(type(e))
+    for name in e.__slots__:
+        setattr(c, name, getattr(e, name))
+    return c
+
+class FrameState:
+    # Everything Renderer.draw reads from a World, copied at the end of a
+    # tick so the render thread never touches the live simulation. Entities
+    # are shallow copies and pools and particles are packed arrays, so a
+    # capture costs a little per entity and no pygame calls. Treat a
+    # published frame as read-only.
+    def __init__(self):
+        self.tick = -1
+        self.time = 0.0
+        self.lag = 0.0
+        self.score = self.combo = self.wave = self.rapid_fire_timer = 0
+        self.boss_active = self.game_over = False
+        self.players = []
+        self.enemies = []
+        self.powerups = []
+        self.boss = None
+        self.bullets = PoolView()
+        self.enemy_bullets = PoolView()
+        self.particles = ParticleView()
+
+    def capture(self, world):
+        self.tick = world.tick
+        self.score, self.combo, self.wave = world.score, world.combo, world.wave
+        self.rapid_fire_timer = world.rapid_fire_timer
+        self.boss_active, self.game_over = world.boss_active, world.game_over
+        self.players = [copy_entity(p) for p in world.players]
+        self.enemies = [copy_entity(e) for e in world.enemies]
+        self.powerups = [copy_entity(q) for q in world.powerups]
+        self.boss = copy_entity(world.boss) if world.boss is not None else None
+        self.bullets.capture(world.bullets)
+        self.enemy_bullets.capture(world.enemy_bullets)
+        self.particles.capture(world.particles)
+
+    def live_players(self):
+        return [p for p in self.players if p.health > 0]
+
+    def entity_counts(self):
+        return {
+            'enemies': len(self.enemies),
+            'bullets': len(self.bullets),
+            'enemy_bullets': len(self.enemy_bullets),
+            'particles': len(self.particles),
+            'powerups': len(self.powerups),
+        }
+
+class TripleBuffer:
+    # Three frames: the writer fills `back` and publish() swaps it with the
+    # ready slot; read() swaps a newer ready frame into `front`. Each side
+    # only ever waits for a pointer swap, the writer never overwrites the
+    # frame being drawn, and the reader always gets the latest whole frame.
+    def __init__(self, factory=FrameState):
+        self.back = factory()
+        self.ready = factory()
+        self.front = factory()
+        self.fresh = False
+        self.lock = threading.Lock()
+
+    def publish(self):
+        with self.lock:
+            self.back, self.ready = self.ready, self.back
+            self.fresh = True
+
+    def read(self):
+        with self.lock:
+            if self.fresh:
+                self.front, self.ready = self.ready, self.front
+                self.fresh = False
+            return self.front
+
+class SimulationThread(threading.Thread):
+    # Runs tick(inputs) on its own thread at a fixed rate and publishes a
+    # FrameState of `world` into a TripleBuffer after each batch of ticks,
+    # so a slow frame or a blocking display flip no longer holds up the
+    # simulation. `inputs` is set by the main thread, which keeps pygame's
+    # event pump and display (they must stay on the main thread).
+    #
+    # With paced=False ticks run back to back, for benchmarks.
+    def __init__(self, world, tick, tick_rate=60, max_steps=5, paced=True, clock=time.perf_counter):
+        super().__init__(name='simulation', daemon=True)
+        self.world = world
+        self.tick = tick
+        self.paced = paced
+        self.clock = clock
+        self.pacer = FixedTimestep(tick_rate, max_steps, clock=clock)
+        self.buffer = TripleBuffer()
+        self.inputs = 0
+        self.ticks = 0
+        self.running = True
+        self.error = None
+
+    def run(self):
+        pacer = self.pacer
+        try:
+            while self.running:
+                steps = pacer.advance() if self.paced else 1
+                for _ in range(steps):
+                    self.tick(self.inputs)
+                self.ticks += steps
+                if steps:
+                    frame = self.buffer.back
+                    frame.capture(self.world)
+                    frame.time = self.clock()
+                    frame.lag = pacer.accumulator if self.paced else 0.0
+                    self.buffer.publish()
+                if self.paced:
+                    # Sleep until the next tick is due
+                    time.sleep(max(0.0, pacer.dt - pacer.accumulator))
+        except BaseException as e:
+            self.error = e
+
+    def alpha(self, frame):
+        # Interpolation factor for drawing `frame` now: the time since its
+        # last tick, in ticks
+        return min(1.0, (frame.lag + self.clock() - frame.time) / self.pacer.dt)
+
+    def stop(self):
+        # Stops the thread and re-raises anything the simulation raised
+        self.running = False
+        if self.is_alive():
+            self.join()
+        if self.error is not None:
+            raise self.error
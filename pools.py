@@ -0,0 +1,143 @@
+import numpy as np
+
+INF = float('inf')
+
+class EntityPool:
+    # Structure-of-arrays store for short-lived entities (bullets, particles).
+    # Every field is a preallocated NumPy array; only the first `count` slots
+    # are live. Motion, lifetime and culling run as one vectorized update and
+    # dead slots are filled by swapping in live entries from the end.
+    # px/py hold the position before the last update, for render interpolation.
+    # Every spawn gets the next `id`, unique within the pool, so entries can
+    # be followed across compactions (network sync).
+    FIELDS = ('x', 'y', 'px', 'py', 'vx', 'vy', 'life', 'size', 'damage', 'color', 'id')
+
+    def __init__(self, capacity=256, w=0, h=0, ox=0, oy=0,
+                 bounds=(-INF, -INF, INF, INF), size_decay=0.0, min_size=0.0):
+        self.capacity = capacity
+        self.count = 0
+        self.next_id = 0
+        # Collision box relative to (x, y)
+        self.w, self.h = w, h
+        self.ox, self.oy = ox, oy
+        # Entities are culled when x < left, x > right, y < top or y > bottom
+        self.bounds = bounds
+        self.size_decay = size_decay
+        self.min_size = min_size
+
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.px = np.zeros(capacity)
+        self.py = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.life = np.zeros(capacity)
+        self.size = np.zeros(capacity)
+        self.damage = np.zeros(capacity, np.int32)
+        self.color = np.zeros((capacity, 3), np.uint8)
+        self.id = np.zeros(capacity, np.int64)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def spawn(self, x, y, vx=0.0, vy=0.0, life=INF, size=0.0, color=(255, 255, 255), damage=1):
+        i = self.count
+        if i == self.capacity:
+            self._grow(i + 1)
+        self.x[i] = self.px[i] = x
+        self.y[i] = self.py[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.life[i] = life
+        self.size[i] = size
+        self.color[i] = color
+        self.damage[i] = damage
+        self.id[i] = self.next_id
+        self.next_id += 1
+        self.count = i + 1
+        return i
+
+    def spawn_many(self, x, y, vx=0.0, vy=0.0, life=INF, size=0.0, color=(255, 255, 255), damage=1):
+        # Bulk spawn; every argument may be a scalar or an array of equal length
+        n = max(np.size(a) for a in (x, y, vx, vy, life, size, damage))
+        if n == 0:
+            return
+        start = self.count
+        end = start + n
+        if end > self.capacity:
+            self._grow(end)
+        self.x[start:end] = self.px[start:end] = x
+        self.y[start:end] = self.py[start:end] = y
+        self.vx[start:end] = vx
+        self.vy[start:end] = vy
+        self.life[start:end] = life
+        self.size[start:end] = size
+        self.color[start:end] = color
+        self.damage[start:end] = damage
+        self.id[start:end] = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        self.count = end
+
+    def kill(self, i):
+        # Marks a slot dead; it is reclaimed by the next compact()
+        self.life[i] = 0
+
+    def is_dead(self, i):
+        return self.life[i] <= 0
+
+    def rects(self):
+        # Integer collision boxes of live entries as (left, top) arrays
+        n = self.count
+        left = (self.x[:n] + self.ox).astype(np.int64)
+        top = (self.y[:n] + self.oy).astype(np.int64)
+        return left, top
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        life = self.life[:n]
+        self.px[:n] = x
+        self.py[:n] = y
+        x += self.vx[:n]
+        y += self.vy[:n]
+        life -= 1
+        if self.size_decay:
+            size = self.size[:n]
+            np.maximum(size - self.size_decay, self.min_size, out=size)
+
+        left, top, right, bottom = self.bounds
+        life[(x < left) | (x > right) | (y < top) | (y > bottom)] = 0
+        self.compact()
+
+    def compact(self):
+        n = self.count
+        alive = self.life[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live == n:
+            return
+        # Swap-with-last: holes in the kept prefix are filled by the live
+        # entries that sit past it, so only dead slots are written.
+        holes = np.flatnonzero(~alive[:live])
+        movers = np.flatnonzero(alive[live:]) + live
+        if len(holes):
+            for name in self.FIELDS:
+                arr = getattr(self, name)
+                arr[holes] = arr[movers]
+        self.count = live
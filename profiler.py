@@ -0,0 +1,181 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+class _NullScope:
+    # Shared no-op context manager handed out while profiling is off
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = _NullScope()
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+        return False
+
+class Profiler:
+    # Named timing scopes for the phases of a frame:
+    #
+    #     with profiler.scope('collide'):
+    #         ...
+    #
+    # Time is summed per phase within a frame; end_frame() pushes the totals
+    # into rolling windows of `history` frames used for the overlay and the
+    # percentile/histogram queries and report(). When disabled, scope() returns a shared
+    # no-op object so instrumented code pays one method call per scope.
+    # With tracing on, every scope is also kept as a trace event for
+    # export_trace() (Chrome trace-event JSON, open in chrome://tracing or
+    # Perfetto); export_csv() writes one row of phase totals per frame,
+    # for every frame (up to max_events) with keep_frames, else for the
+    # last `history`.
+    def __init__(self, enabled=False, history=240, tracing=False, max_events=200000, keep_frames=False):
+        self.enabled = enabled or tracing
+        # What the overlay returns to when it closes
+        self.collecting = self.enabled
+        self.tracing = tracing
+        self.history = history
+        self.phases = {}
+        self.frame = {}
+        if keep_frames:
+            kept = max_events
+        else:
+            kept = max_events // 8 if tracing else history
+        self.frames = deque(maxlen=kept)
+        self.counts = {}
+        self.events = deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+        self.frame_index = 0
+
+        self.overlay_visible = False
+        self.overlay_surface = None
+        self.overlay_age = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return _Scope(self, name)
+
+    def add(self, name, start, end):
+        duration = end - start
+        self.frame[name] = self.frame.get(name, 0.0) + duration
+        if self.tracing:
+            self.events.append((name, start, duration))
+
+    def end_frame(self, counts=None):
+        if not self.enabled:
+            return
+        for name, duration in self.frame.items():
+            window = self.phases.get(name)
+            if window is None:
+                window = self.phases[name] = deque(maxlen=self.history)
+            window.append(duration * 1000)
+        self.frames.append((self.frame_index, self.frame))
+        self.frame = {}
+        self.frame_index += 1
+        if counts:
+            self.counts = counts
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.enabled = self.overlay_visible or self.collecting
+        self.overlay_surface = None
+
+    def summary(self):
+        # {phase: (mean ms, p95 ms, max ms)} over the rolling window
+        out = {}
+        for name, window in self.phases.items():
+            if window:
+                ms = np.fromiter(window, float, len(window))
+                out[name] = (float(ms.mean()), float(np.percentile(ms, 95)), float(ms.max()))
+        return out
+
+    def histogram(self, name, bins=20):
+        # (counts, edges) of the rolling window for one phase
+        window = self.phases.get(name, ())
+        return np.histogram(np.fromiter(window, float, len(window)), bins)
+
+    def report(self, bins=10, width=40):
+        # Text lines for the terminal: each phase's summary, then a bar per
+        # histogram bin, the longest `width` characters
+        lines = []
+        for name, (mean, p95, peak) in sorted(self.summary().items()):
+            lines.append(f"{name}: avg {mean:.2f} ms, p95 {p95:.2f} ms, max {peak:.2f} ms")
+            counts, edges = self.histogram(name, bins)
+            top = max(1, counts.max())
+            for count, low, high in zip(counts, edges, edges[1:]):
+                bar = '#' * round(count * width / top)
+                lines.append(f"  {low:7.3f}-{high:7.3f} ms {bar:<{width}} {count}")
+        return lines
+
+    def draw_overlay(self, surface, font, pos, refresh=15):
+        # Re-renders the table panel every `refresh` frames; returns its rect
+        if not self.overlay_visible:
+            return None
+        self.overlay_age += 1
+        if self.overlay_surface is None or self.overlay_age >= refresh:
+            self.overlay_age = 0
+            self.overlay_surface = self.render_overlay(font)
+        return surface.blit(self.overlay_surface, pos)
+
+    def render_overlay(self, font, columns=(0, 120, 170, 220)):
+        white = (255, 255, 255)
+        rows = [('phase ms', 'avg', 'p95', 'max')]
+        for name, stats in sorted(self.summary().items()):
+            rows.append((name,) + tuple(f"{v:.2f}" for v in stats))
+        counts = [f"{name}: {count}" for name, count in self.counts.items()]
+
+        line_h = font.get_linesize()
+        width = columns[-1] + 50
+        height = (len(rows) + len(counts)) * line_h + 12
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        y = 6
+        for row in rows:
+            for i, (cell, x) in enumerate(zip(row, columns)):
+                text = font.render(cell, True, white)
+                # Numbers are right-aligned to the end of their column
+                left = 6 + x if i == 0 else 6 + x + 45 - text.get_width()
+                panel.blit(text, (left, y))
+            y += line_h
+        for line in counts:
+            panel.blit(font.render(line, True, white), (6, y))
+            y += line_h
+        return panel
+
+    def export_trace(self, path):
+        origin = self.origin
+        events = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                   'ts': (start - origin) * 1e6, 'dur': duration * 1e6}
+                  for name, start, duration in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export_csv(self, path):
+        names = sorted({name for _, frame in self.frames for name in frame})
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + [f"{name}_ms" for name in names])
+            for index, frame in self.frames:
+                writer.writerow([index] + [f"{frame.get(name, 0.0) * 1000:.4f}" for name in names])
+
+NULL_PROFILER = Profiler()
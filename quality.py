@@ -0,0 +1,86 @@
+import time
+from collections import deque
+
+class QualityTier:
+    # What the game draws at one level of detail
+    def __init__(self, name, particle_scale, stars, shield_ring, weapon_pips, boss_detail):
+        self.name = name
+        # Multiplier on the particles per explosion
+        self.particle_scale = particle_scale
+        # Background stars drawn
+        self.stars = stars
+        self.shield_ring = shield_ring
+        self.weapon_pips = weapon_pips
+        # Full boss health bar (background, fill, outline) or just the fill
+        self.boss_detail = boss_detail
+
+QUALITY_TIERS = [
+    QualityTier('high', 1.0, 50, True, True, True),
+    QualityTier('medium', 0.5, 30, True, True, True),
+    QualityTier('low', 0.25, 15, False, False, True),
+    QualityTier('minimal', 0.1, 0, False, False, False),
+]
+
+class QualityGovernor:
+    # Steps down through quality tiers while frames run over budget and
+    # back up when there is headroom. Frame work time (everything but the
+    # wait for the frame cap) is averaged over a rolling `window` of frames:
+    #
+    #   mean > budget * down        drop a tier
+    #   mean < budget * up          raise a tier
+    #
+    # with up well below down so that the cost a tier adds back doesn't
+    # push the mean straight over budget again, and at least `dwell`
+    # seconds in a tier before any change so one slow frame (or a tier
+    # change still settling) can't make it oscillate. The window restarts
+    # after each change so the new tier is judged on its own frames.
+    def __init__(self, budget, tiers=QUALITY_TIERS, window=30, down=1.0, up=0.6, dwell=1.0,
+                 clock=time.perf_counter):
+        self.budget = budget
+        self.tiers = tiers
+        self.window = deque(maxlen=window)
+        self.down = down
+        self.up = up
+        self.dwell = dwell
+        self.clock = clock
+        self.index = 0
+        self.changes = 0
+        self.time_in_tier = [0.0] * len(tiers)
+        self.last = self.changed_at = clock()
+
+    @property
+    def tier(self):
+        return self.tiers[self.index]
+
+    def frame(self, work_time):
+        # Call once per frame with that frame's work time in seconds;
+        # returns the tier to draw the next frame with
+        now = self.clock()
+        self.time_in_tier[self.index] += now - self.last
+        self.last = now
+        window = self.window
+        window.append(work_time)
+        if len(window) < window.maxlen or now - self.changed_at < self.dwell:
+            return self.tier
+
+        mean = sum(window) / len(window)
+        if mean > self.budget * self.down and self.index < len(self.tiers) - 1:
+            self.set_tier(self.index + 1, now)
+        elif mean < self.budget * self.up and self.index > 0:
+            self.set_tier(self.index - 1, now)
+        return self.tier
+
+    def set_tier(self, index, now=None):
+        self.index = index
+        self.changes += 1
+        self.changed_at = self.clock() if now is None else now
+        self.window.clear()
+
+    def report(self):
+        # Lines for the end-of-session summary
+        total = max(sum(self.time_in_tier), 1e-9)
+        lines = [f"quality: {self.tier.name} now, {self.changes} changes, "
+                 f"budget {self.budget * 1000:.1f} ms"]
+        for tier, seconds in zip(self.tiers, self.time_in_tier):
+            lines.append(f"  {tier.name:<8} {seconds:8.1f} s  {seconds / total * 100:5.1f}%")
+        return lines
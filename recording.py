@@ -0,0 +1,109 @@
+import struct
+
+# Input recording format, all little-endian:
+#   header   magic b'SDRP', u8 version, u64 seed
+#   body     runs of (varint length, u8 input mask); a zero length ends it
+#   trailer  u32 tick count, 8-byte World.state_hash() of the final state
+MAGIC = b'SDRP'
+# Bumped whenever gameplay changes so the same inputs no longer reproduce
+# a run: older recordings are rejected instead of replaying to a mismatch.
+#   2  flocking/formation/dive enemies from wave 2, combo timer restored,
+#      a fresh seed per run after a restart
+VERSION = 2
+HEADER = struct.Struct('<4sBQ')
+TRAILER = struct.Struct('<I8s')
+
+class RecordingError(Exception):
+    pass
+
+def encode_varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def decode_varint(data, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(data):
+            raise RecordingError("truncated recording")
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, pos
+        shift += 7
+
+class InputRecorder:
+    # Writes one input bitmask per tick, run-length encoded; a held key or
+    # an idle stretch costs a couple of bytes however long it lasts
+    def __init__(self, path, seed):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed))
+        self.mask = None
+        self.run = 0
+        self.ticks = 0
+
+    def record(self, inputs):
+        if inputs == self.mask:
+            self.run += 1
+        else:
+            self.flush_run()
+            self.mask = inputs
+            self.run = 1
+        self.ticks += 1
+
+    def flush_run(self):
+        if self.run:
+            self.file.write(encode_varint(self.run) + bytes((self.mask,)))
+            self.run = 0
+
+    def close(self, world):
+        self.flush_run()
+        self.file.write(encode_varint(0))
+        self.file.write(TRAILER.pack(self.ticks, world.state_hash()))
+        self.file.close()
+
+class Recording:
+    def __init__(self, seed, runs, ticks, state_hash):
+        self.seed = seed
+        self.runs = runs
+        self.ticks = ticks
+        self.state_hash = state_hash
+
+    def inputs(self):
+        # Expands the runs back into one mask per tick
+        for length, mask in self.runs:
+            for _ in range(length):
+                yield mask
+
+def load_recording(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise RecordingError("truncated recording")
+    magic, version, seed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise RecordingError("not a Space Defender recording")
+    if version != VERSION:
+        raise RecordingError(f"unsupported recording version {version}")
+
+    pos = HEADER.size
+    runs = []
+    while True:
+        length, pos = decode_varint(data, pos)
+        if length == 0:
+            break
+        if pos >= len(data):
+            raise RecordingError("truncated recording")
+        runs.append((length, data[pos]))
+        pos += 1
+    if len(data) - pos < TRAILER.size:
+        raise RecordingError("recording has no trailer")
+    ticks, state_hash = TRAILER.unpack_from(data, pos)
+    return Recording(seed, runs, ticks, state_hash)
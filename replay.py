@@ -0,0 +1,45 @@
+# Re-runs input recordings headless as fast as the CPU allows and checks the
+# final state against the hash stored when the run was recorded.
+#
+#   python replay.py session.sdr [more.sdr ...]
+#
+# Exits non-zero if any replay diverges.
+import argparse
+import sys
+import time
+
+from recording import RecordingError, load_recording
+from space_defender import World
+
+def replay(recording):
+    world = World(recording.seed)
+    step = world.step
+    start = time.perf_counter()
+    for inputs in recording.inputs():
+        step(inputs)
+    return world, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay Space Defender recordings headless")
+    parser.add_argument('paths', nargs='+', metavar='PATH')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.paths:
+        try:
+            recording = load_recording(path)
+        except (OSError, RecordingError) as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+
+        world, elapsed = replay(recording)
+        ok = world.state_hash() == recording.state_hash
+        failed |= not ok
+        rate = recording.ticks / elapsed if elapsed else float('inf')
+        print(f"{path}: {'OK' if ok else 'MISMATCH'} score={world.score} wave={world.wave} "
+              f"ticks={recording.ticks} ({rate:.0f} ticks/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
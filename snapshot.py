@@ -0,0 +1,259 @@
+import math
+import struct
+from collections import deque
+
+import numpy as np
+
+# World snapshot format, all little-endian:
+#   header     magic b'SDSS', u8 version, u64 seed
+#   world      tick, score, combo and wave counters, every timer, flags
+#   players    u8 count, then PLAYER records (position, health, shield,
+#              weapon, cooldown)
+#   rng        Mersenne Twister state (625 words, gauss) and PCG64 state
+#   enemies    u32 count, then ENEMY records (including steering state)
+#   powerups   u32 count, then POWERUP records
+#   boss       u8 present, BOSS record, u8 emitter count, u32 volleys each
+#   pools      bullets and enemy bullets: u32 count, u64 next id, then
+#              each field's first `count` entries as raw arrays
+#   particles  u32 count of live slots, their indices and field values,
+#              then u32 cursor
+MAGIC = b'SDSS'
+VERSION = 3
+HEADER = struct.Struct('<4sBQ')
+WORLD = struct.Struct('<Iq7i??')
+PLAYER = struct.Struct('<11i')
+MT_STATE = struct.Struct('<625I?d')
+PCG_STATE = struct.Struct('<16s16s?I')
+COUNT = struct.Struct('<I')
+NEXT_ID = struct.Struct('<Q')
+BOSS = struct.Struct('<Qddddiiiiii')
+
+ENEMY = np.dtype([('id', '<u8'), ('x', '<f8'), ('y', '<f8'), ('px', '<f8'), ('py', '<f8'),
+                  ('speed', '<f8'), ('health', '<i4'), ('max_health', '<i4'), ('points', '<i4'),
+                  ('type', 'u1'), ('behavior', 'u1'), ('vx', '<f8'), ('vy', '<f8'),
+                  ('hx', '<f8'), ('hy', '<f8'), ('timer', '<i4')])
+POWERUP = np.dtype([('id', '<u8'), ('x', '<f8'), ('y', '<f8'), ('px', '<f8'), ('py', '<f8'),
+                    ('speed', '<f8'), ('type', 'u1')])
+
+PARTICLE_FIELDS = ('x', 'y', 'px', 'py', 'vx', 'vy', 'life', 'size', 'color')
+
+class SnapshotError(Exception):
+    pass
+
+class SnapshotTypes:
+    # How to rebuild the world's entities, supplied by the game so this
+    # module doesn't depend on it. Enemy and power-up types and enemy
+    # behaviours are stored as indexes into their lists.
+    def __init__(self, player, enemy, powerup, boss, bullet_pool, enemy_bullet_pool,
+                 enemy_types, powerup_types, enemy_behaviors):
+        self.player = player
+        self.enemy = enemy
+        self.powerup = powerup
+        self.boss = boss
+        self.bullet_pool = bullet_pool
+        self.enemy_bullet_pool = enemy_bullet_pool
+        self.enemy_types = list(enemy_types)
+        self.powerup_types = list(powerup_types)
+        self.enemy_behaviors = list(enemy_behaviors)
+
+def save_snapshot(world, types):
+    out = [HEADER.pack(MAGIC, VERSION, world.seed)]
+    out.append(WORLD.pack(world.tick, world.score, world.combo, world.combo_timer, world.wave,
+                          world.kills_this_wave, world.enemy_spawn_timer, world.powerup_spawn_timer,
+                          world.rapid_fire_timer, world.boss_active, world.game_over))
+    out.append(bytes((len(world.players),)))
+    for p in world.players:
+        out.append(PLAYER.pack(p.x, p.y, p.px, p.py, p.speed, p.health, p.max_health,
+                               p.shield, p.max_shield, p.weapon_level, p.shoot_cooldown))
+
+    _, mt, gauss = world.rng.getstate()
+    out.append(MT_STATE.pack(*mt, gauss is not None, gauss or 0.0))
+    pcg = world.np_rng.bit_generator.state
+    out.append(PCG_STATE.pack(pcg['state']['state'].to_bytes(16, 'little'),
+                              pcg['state']['inc'].to_bytes(16, 'little'),
+                              bool(pcg['has_uint32']), pcg['uinteger']))
+
+    enemies = np.empty(len(world.enemies), ENEMY)
+    if len(enemies):
+        enemies[:] = [(e.id, e.x, e.y, e.px, e.py, e.speed, e.health, e.max_health, e.points,
+                       types.enemy_types.index(e.type), types.enemy_behaviors.index(e.behavior),
+                       e.vx, e.vy, e.hx, e.hy, e.timer) for e in world.enemies]
+    out.append(COUNT.pack(len(enemies)))
+    out.append(enemies.tobytes())
+
+    powerups = np.empty(len(world.powerups), POWERUP)
+    if len(powerups):
+        powerups[:] = [(q.id, q.x, q.y, q.px, q.py, q.speed, types.powerup_types.index(q.type))
+                       for q in world.powerups]
+    out.append(COUNT.pack(len(powerups)))
+    out.append(powerups.tobytes())
+
+    boss = world.boss
+    out.append(bytes((boss is not None,)))
+    if boss is not None:
+        out.append(BOSS.pack(boss.id, boss.x, boss.y, boss.px, boss.py, boss.health, boss.max_health,
+                             boss.speed, boss.direction, boss.shoot_timer, boss.phase))
+        volleys = [emitter.volley for phase in sorted(boss.emitters)
+                   for emitter in boss.emitters[phase]]
+        out.append(bytes((len(volleys),)))
+        out.append(np.array(volleys, '<u4').tobytes())
+
+    for pool in (world.bullets, world.enemy_bullets):
+        n = pool.count
+        out.append(COUNT.pack(n))
+        out.append(NEXT_ID.pack(pool.next_id))
+        for name in pool.FIELDS:
+            out.append(getattr(pool, name)[:n].tobytes())
+
+    particles = world.particles
+    live = particles.live()
+    out.append(COUNT.pack(len(live)))
+    out.append(live.astype('<u4').tobytes())
+    for name in PARTICLE_FIELDS:
+        out.append(getattr(particles, name)[live].tobytes())
+    out.append(COUNT.pack(particles.cursor))
+    return b''.join(out)
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise SnapshotError("truncated snapshot")
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.take(fmt.size))
+
+    def array(self, dtype, count, shape=()):
+        dtype = np.dtype(dtype)
+        items = count * math.prod(shape)
+        values = np.frombuffer(self.take(items * dtype.itemsize), dtype, items)
+        return values.reshape((count,) + shape) if shape else values
+
+def load_snapshot(world, data, types):
+    # Restores `data` into `world` in place; the world's profiler, particle
+    # budget and broadphase grid are kept
+    r = _Reader(data)
+    magic, version, seed = r.unpack(HEADER)
+    if magic != MAGIC:
+        raise SnapshotError("not a Space Defender snapshot")
+    if version != VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+
+    (tick, score, combo, combo_timer, wave, kills_this_wave, enemy_spawn_timer,
+     powerup_spawn_timer, rapid_fire_timer, boss_active, game_over) = r.unpack(WORLD)
+    players = []
+    for _ in range(r.take(1)[0]):
+        player = types.player()
+        (player.x, player.y, player.px, player.py, player.speed, player.health, player.max_health,
+         player.shield, player.max_shield, player.weapon_level, player.shoot_cooldown) = r.unpack(PLAYER)
+        players.append(player)
+
+    mt = r.unpack(MT_STATE)
+    rng_state = (3, mt[:625], mt[626] if mt[625] else None)
+    state, inc, has_uint32, uinteger = r.unpack(PCG_STATE)
+    pcg_state = {'bit_generator': 'PCG64',
+                 'state': {'state': int.from_bytes(state, 'little'),
+                           'inc': int.from_bytes(inc, 'little')},
+                 'has_uint32': int(has_uint32), 'uinteger': uinteger}
+
+    enemies = []
+    for (eid, x, y, px, py, speed, health, max_health, points, type_code, behavior,
+         vx, vy, hx, hy, timer) in r.array(ENEMY, *r.unpack(COUNT)).tolist():
+        e = types.enemy(types.enemy_types[type_code])
+        e.id, e.x, e.y, e.px, e.py, e.speed = eid, x, y, px, py, speed
+        e.health, e.max_health, e.points = health, max_health, points
+        e.behavior = types.enemy_behaviors[behavior]
+        e.vx, e.vy, e.hx, e.hy, e.timer = vx, vy, hx, hy, timer
+        enemies.append(e)
+
+    powerups = []
+    for eid, x, y, px, py, speed, type_code in r.array(POWERUP, *r.unpack(COUNT)).tolist():
+        q = types.powerup(x, y, types.powerup_types[type_code])
+        q.id, q.px, q.py, q.speed = eid, px, py, speed
+        powerups.append(q)
+
+    boss = None
+    if r.take(1)[0]:
+        boss = types.boss()
+        (boss.id, boss.x, boss.y, boss.px, boss.py, boss.health, boss.max_health, boss.speed,
+         boss.direction, boss.shoot_timer, boss.phase) = r.unpack(BOSS)
+        volleys = r.array('<u4', r.take(1)[0]).tolist()
+        emitters = [emitter for phase in sorted(boss.emitters) for emitter in boss.emitters[phase]]
+        if len(volleys) != len(emitters):
+            raise SnapshotError("snapshot boss patterns don't match this build")
+        for emitter, volley in zip(emitters, volleys):
+            emitter.volley = volley
+
+    pools = []
+    for pool in (types.bullet_pool(), types.enemy_bullet_pool()):
+        n, = r.unpack(COUNT)
+        pool.next_id, = r.unpack(NEXT_ID)
+        if n > pool.capacity:
+            pool._grow(n)
+        for name in pool.FIELDS:
+            arr = getattr(pool, name)
+            arr[:n] = r.array(arr.dtype, n, arr.shape[1:])
+        pool.count = n
+        pools.append(pool)
+
+    particles = world.particles
+    n, = r.unpack(COUNT)
+    live = r.array('<u4', n)
+    if n and live.max() >= particles.budget:
+        raise SnapshotError("snapshot particles exceed this world's budget")
+    fields = [(name, r.array(getattr(particles, name).dtype, n, getattr(particles, name).shape[1:]))
+              for name in PARTICLE_FIELDS]
+    cursor, = r.unpack(COUNT)
+
+    # Everything parsed; only now touch the world
+    world.seed = seed
+    world.tick, world.score, world.combo, world.combo_timer = tick, score, combo, combo_timer
+    world.wave, world.kills_this_wave = wave, kills_this_wave
+    world.enemy_spawn_timer, world.powerup_spawn_timer = enemy_spawn_timer, powerup_spawn_timer
+    world.rapid_fire_timer = rapid_fire_timer
+    world.boss_active, world.game_over = boss_active, game_over
+    world.players = players
+    world.num_players = len(players)
+    world.active = world.live_players()
+    world.rng.setstate(rng_state)
+    world.np_rng.bit_generator.state = pcg_state
+    world.enemies = enemies
+    world.powerups = powerups
+    world.boss = boss
+    world.bullets, world.enemy_bullets = pools
+    particles.clear()
+    for name, values in fields:
+        getattr(particles, name)[live] = values
+    particles.cursor = cursor % particles.budget
+    world.dead = set()
+
+class SnapshotRing:
+    # The last `size` snapshots, newest last, for rollback
+    def __init__(self, size=120):
+        self.snapshots = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def push(self, world):
+        self.snapshots.append(world.snapshot())
+
+    def clear(self):
+        self.snapshots.clear()
+
+    def rewind(self, world, ticks=1):
+        # Restores the snapshot `ticks` pushes back and drops everything
+        # newer; returns False when the ring is empty
+        if not self.snapshots:
+            return False
+        ticks = min(ticks, len(self.snapshots))
+        for _ in range(ticks - 1):
+            self.snapshots.pop()
+        world.restore(self.snapshots.pop())
+        return True
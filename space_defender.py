@@ -1,15 +1,48 @@
+import time
+
+# Taken before the heavy imports, for the startup report
+IMPORT_STARTED = time.perf_counter()
+
+import argparse
 import asyncio
+import gc
+import hashlib
+import itertools
+import os
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
 import pygame
 import random
 import math
+from collections import deque
 
-# Initialize Pygame
-pygame.init()
+import numpy as np
 
-# Screen dimensions
+from allocs import AllocationMonitor
+from atlas import ScaledAtlas, SpriteAtlas
+from dirty import DirtyRectTracker
+from hud import Hud, load_font
+from leaderboard import DEFAULT_DIR as LEADERBOARD_DIR, Leaderboard, LeaderboardError
+from pacing import FixedTimestep
+from pipeline import SimulationThread
+from particles import ParticleRenderer, ParticleSystem
+from patterns import BulletPattern, Emitter
+from pools import INF, EntityPool
+from profiler import NULL_PROFILER, Profiler
+from quality import QUALITY_TIERS, QualityGovernor
+from recording import InputRecorder
+from snapshot import SnapshotRing, SnapshotTypes, load_snapshot, save_snapshot
+from spatial import SpatialHash
+from steering import NeighborGrid, clamp_length, flock_terms, separation
+from viewport import Viewport, fit, line_width, scale_rect
+
+# Logical playfield: simulation bounds and layout coordinates. The render
+# resolution (--render-scale) and the window size are independent of it.
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Space Defender - Enhanced")
+RENDER_SCALE_RANGE = (0.25, 4.0)
+# Seeds are stored as u64 in snapshots and recordings
+MAX_SEED = 2 ** 64 - 1
 
 # Colors
 BLACK = (0, 0, 0)
@@ -24,13 +57,103 @@ ORANGE = (255, 165, 0)
 PINK = (255, 105, 180)
 GOLD = (255, 215, 0)
 
-# Clock
-clock = pygame.time.Clock()
+ENEMY_STYLES = {
+    # type: (color, width, height)
+    'normal': (RED, 35, 35),
+    'fast': (PINK, 35, 35),
+    'tank': ((100, 0, 100), 45, 45),
+}
+
+POWERUP_TYPES = ['health', 'rapid_fire', 'shield', 'weapon_up']
+
+# Enemy behaviours. 'straight' enemies fall at their speed; the others are
+# steered together each tick by World.steer_enemies:
+#   formation  holds a slot in a V that sways as it descends
+#   dive       drops in, then swoops at where the player was
+#   flock      swarms of fast enemies: separation, cohesion, alignment
+ENEMY_BEHAVIORS = ['straight', 'formation', 'dive', 'flock']
+FORMATION_SIZE = 5
+FORMATION_SPACING = (50, 30)
+FORMATION_DESCENT = 1.0
+FORMATION_SWAY = 60
+FORMATION_PERIOD = 240
+FORMATION_CHANCE = 0.1
+# Chance per tick, from wave 3, that a formation member peels off to dive
+PEEL_CHANCE = 0.01
+DIVE_CHANCE = 0.25
+DIVE_START_Y = 100
+DIVE_TURN = 0.35
+SWARM_SIZE = 12
+SWARM_CHANCE = 0.06
+# Steering weights and limits, per tick
+NEIGHBOR_RADIUS = 48
+SEPARATION_RADIUS = 36
+SEPARATION_WEIGHT = 25.0
+COHESION_WEIGHT = 0.01
+ALIGNMENT_WEIGHT = 0.05
+GOAL_WEIGHT = 0.05
+PLAYER_PULL = 0.002
+MAX_STEER = 0.4
+
+POWERUP_COLORS = {
+    'health': GREEN,
+    'rapid_fire': PURPLE,
+    'shield': CYAN,
+    'weapon_up': GOLD
+}
+
+# FPS is the fixed simulation tick rate; speeds, cooldowns and timers are
+# all counted in ticks
 FPS = 60
+MAX_CATCHUP_STEPS = 5
 
-class Player:
-    def __init__(self):
-        self.x = WIDTH // 2
+# Ids for object entities (enemies, power-ups, bosses), unique per process
+ENTITY_IDS = itertools.count(1)
+
+# Maximum live particles; past this, new explosions reuse the oldest slots
+PARTICLE_BUDGET = 2048
+
+# Input bits passed to World.step, one bitmask per tick
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_FIRE = 16
+INPUT_RESTART = 32
+
+def read_inputs(keys):
+    inputs = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        inputs |= INPUT_LEFT
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        inputs |= INPUT_RIGHT
+    if keys[pygame.K_UP] or keys[pygame.K_w]:
+        inputs |= INPUT_UP
+    if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        inputs |= INPUT_DOWN
+    if keys[pygame.K_SPACE] or keys[pygame.K_j]:
+        inputs |= INPUT_FIRE
+    if keys[pygame.K_r]:
+        inputs |= INPUT_RESTART
+    return inputs
+
+class Entity:
+    # Base of Player, Enemy, Boss and PowerUp, which keep their attributes
+    # in __slots__ including x, y, w, h and a Rect, `rect`
+    __slots__ = ()
+
+    def get_rect(self):
+        # One Rect per entity, moved in place, so collision passes allocate none
+        rect = self.rect
+        rect.update(self.x, self.y, self.w, self.h)
+        return rect
+
+class Player(Entity):
+    __slots__ = ('x', 'y', 'w', 'h', 'speed', 'health', 'max_health', 'shield', 'max_shield',
+                 'weapon_level', 'shoot_cooldown', 'px', 'py', 'rect')
+
+    def __init__(self, x=WIDTH // 2):
+        self.x = x
         self.y = HEIGHT - 80
         self.w = 40
         self.h = 40
@@ -40,44 +163,53 @@ class Player:
         self.shield = 0
         self.max_shield = 50
         self.weapon_level = 1
+        self.shoot_cooldown = 0
+        # Position at the start of the tick, for render interpolation
+        self.px, self.py = self.x, self.y
+        self.rect = pygame.Rect(0, 0, 0, 0)
         
-    def move(self, keys):
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+    def move(self, inputs):
+        if inputs & INPUT_LEFT:
             self.x -= self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if inputs & INPUT_RIGHT:
             self.x += self.speed
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
+        if inputs & INPUT_UP:
             self.y -= self.speed
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
+        if inputs & INPUT_DOWN:
             self.y += self.speed
         
         self.x = max(0, min(WIDTH - self.w, self.x))
         self.y = max(0, min(HEIGHT - self.h, self.y))
     
-    def draw(self):
-        # Shield effect
-        if self.shield > 0:
-            pygame.draw.circle(screen, (0, 200, 255, 100), 
-                             (self.x + self.w // 2, self.y + self.h // 2), 
-                             self.w, 2)
-        
+    def sprite_key(self):
+        return ('player', self.weapon_level)
+
+    @staticmethod
+    def build_sprite(weapon_level, w=40, h=40):
+        surface = pygame.Surface((w + 1, h + 1), pygame.SRCALPHA)
+
         # Ship body
-        pygame.draw.polygon(screen, CYAN, [
-            (self.x + self.w // 2, self.y),
-            (self.x, self.y + self.h),
-            (self.x + self.w, self.y + self.h)
+        pygame.draw.polygon(surface, CYAN, [
+            (w // 2, 0),
+            (0, h),
+            (w, h)
         ])
         # Cockpit
-        pygame.draw.circle(screen, BLUE, (self.x + self.w // 2, self.y + 15), 8)
-        
+        pygame.draw.circle(surface, BLUE, (w // 2, 15), 8)
+
         # Weapon indicator
-        if self.weapon_level > 1:
-            for i in range(self.weapon_level - 1):
-                pygame.draw.circle(screen, GOLD, 
-                                 (self.x + 10 + i * 10, self.y + self.h - 5), 2)
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+        if weapon_level > 1:
+            for i in range(weapon_level - 1):
+                pygame.draw.circle(surface, GOLD, (10 + i * 10, h - 5), 2)
+        return surface, (0, 0)
+
+    def draw_overlay(self, surface, x, y, scale=1):
+        # Shield effect; x and y are logical, drawing is at `scale`
+        if self.shield > 0:
+            return [pygame.draw.circle(surface, (0, 200, 255, 100),
+                                       ((x + self.w // 2) * scale, (y + self.h // 2) * scale),
+                                       self.w * scale, line_width(2, scale))]
+        return []
     
     def take_damage(self, damage):
         if self.shield > 0:
@@ -88,78 +220,129 @@ class Player:
         else:
             self.health -= damage
 
-class Bullet:
-    def __init__(self, x, y, angle=0, damage=1):
-        self.x = x
-        self.y = y
-        self.speed = 8
-        self.w = 4
-        self.h = 15
-        self.angle = angle
-        self.damage = damage
-        
-    def update(self):
-        self.y -= self.speed * math.cos(math.radians(self.angle))
-        self.x += self.speed * math.sin(math.radians(self.angle))
-    
-    def draw(self):
-        pygame.draw.rect(screen, YELLOW, (self.x, self.y, self.w, self.h))
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
-
-class Enemy:
-    def __init__(self, enemy_type='normal'):
-        self.x = random.randint(0, WIDTH - 40)
-        self.y = random.randint(-100, -40)
-        self.w = 35
-        self.h = 35
+def build_bullet_sprite():
+    surface = pygame.Surface((4, 15))
+    surface.fill(YELLOW)
+    return surface, (0, 0)
+
+def build_enemy_bullet_sprite():
+    surface = pygame.Surface((10, 10), pygame.SRCALPHA)
+    pygame.draw.circle(surface, RED, (5, 5), 5)
+    return surface, (-5, -5)
+
+# Bullets and enemy bullets live in EntityPools (see pools.py), particles in
+# a fixed-budget ParticleSystem (see particles.py).
+# Velocities are derived from the firing angle once, at spawn time.
+BULLET_SPEED = 8
+ENEMY_BULLET_SPEED = 5
+
+def make_bullet_pool():
+    return EntityPool(256, w=4, h=15, bounds=(0, 0, WIDTH, INF))
+
+def make_enemy_bullet_pool():
+    return EntityPool(256, w=10, h=10, ox=-5, oy=-5, bounds=(0, -HEIGHT, WIDTH, HEIGHT))
+
+def spawn_bullet(pool, x, y, angle=0, damage=1):
+    rad = math.radians(angle)
+    pool.spawn(x, y, BULLET_SPEED * math.sin(rad), -BULLET_SPEED * math.cos(rad),
+               color=YELLOW, damage=damage)
+
+def spawn_enemy_bullet(pool, x, y, angle=0):
+    rad = math.radians(angle)
+    pool.spawn(x, y, ENEMY_BULLET_SPEED * math.sin(rad), ENEMY_BULLET_SPEED * math.cos(rad),
+               color=RED, damage=10)
+
+def enemy_pattern(kind='fan', count=1, **kwargs):
+    return BulletPattern(kind, count, speeds=kwargs.pop('speeds', ENEMY_BULLET_SPEED),
+                         color=RED, damage=10, **kwargs)
+
+BULLET_PATTERNS = {
+    'single': enemy_pattern(),
+    'triple': enemy_pattern(count=3, spread=40),
+    'ring': enemy_pattern('ring', 24),
+    'spiral': enemy_pattern('ring', 6, spin=11, speeds=4),
+    'aimed_burst': enemy_pattern(count=5, spread=24, speeds=(4, 5, 6), aimed=True),
+    'wave': enemy_pattern(count=9, spread=80, sweep=30, period=12, speeds=4),
+    'storm': enemy_pattern('ring', 48, spin=7, speeds=(3, 4, 5)),
+}
+
+# Patterns fired together on each boss volley, per phase
+BOSS_PATTERNS = {
+    1: ['single'],
+    2: ['triple'],
+}
+
+class Enemy(Entity):
+    __slots__ = ('id', 'x', 'y', 'type', 'speed', 'health', 'points', 'color', 'w', 'h', 'max_health',
+                 'px', 'py', 'behavior', 'vx', 'vy', 'hx', 'hy', 'timer', 'rect')
+
+    def __init__(self, enemy_type='normal', rng=random):
+        self.id = next(ENTITY_IDS)
+        self.x = rng.randint(0, WIDTH - 40)
+        self.y = rng.randint(-100, -40)
         self.type = enemy_type
         
         if enemy_type == 'fast':
-            self.speed = random.uniform(3.5, 5.0)
+            self.speed = rng.uniform(3.5, 5.0)
             self.health = 1
-            self.color = PINK
             self.points = 15
         elif enemy_type == 'tank':
-            self.speed = random.uniform(1.0, 2.0)
+            self.speed = rng.uniform(1.0, 2.0)
             self.health = 5
-            self.color = (100, 0, 100)
             self.points = 30
-            self.w = 45
-            self.h = 45
         else:
-            self.speed = random.uniform(1.5, 3.5)
+            self.speed = rng.uniform(1.5, 3.5)
             self.health = 2
-            self.color = RED
             self.points = 10
+        self.color, self.w, self.h = ENEMY_STYLES.get(enemy_type, ENEMY_STYLES['normal'])
             
         self.max_health = self.health
+        self.px, self.py = self.x, self.y
+
+        # Steering state (see World.steer_enemies): velocity, a home point
+        # (formation origin or dive target) and a behaviour timer
+        self.behavior = 'straight'
+        self.vx, self.vy = 0.0, float(self.speed)
+        self.hx = self.hy = 0.0
+        self.timer = 0
+        self.rect = pygame.Rect(0, 0, 0, 0)
         
     def update(self):
         self.y += self.speed
     
-    def draw(self):
+    def sprite_key(self):
+        return ('enemy', self.type)
+
+    @staticmethod
+    def build_sprite(enemy_type):
+        color, w, h = ENEMY_STYLES.get(enemy_type, ENEMY_STYLES['normal'])
+        surface = pygame.Surface((w + 1, h + 10), pygame.SRCALPHA)
+
         # Enemy ship
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.w, self.h))
-        pygame.draw.polygon(screen, tuple(c // 2 for c in self.color), [
-            (self.x, self.y),
-            (self.x + self.w // 2, self.y - 10),
-            (self.x + self.w, self.y)
+        pygame.draw.rect(surface, color, (0, 10, w, h))
+        pygame.draw.polygon(surface, tuple(c // 2 for c in color), [
+            (0, 10),
+            (w // 2, 0),
+            (w, 10)
         ])
-        
+        return surface, (0, -10)
+
+    def draw_overlay(self, surface, x, y, scale=1):
         # Health bar for tanks
         if self.type == 'tank':
             bar_w = self.w
             health_ratio = self.health / self.max_health
-            pygame.draw.rect(screen, RED, (self.x, self.y - 8, bar_w, 4))
-            pygame.draw.rect(screen, GREEN, (self.x, self.y - 8, int(bar_w * health_ratio), 4))
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+            bar = pygame.draw.rect(surface, RED, scale_rect((x, y - 8, bar_w, 4), scale))
+            pygame.draw.rect(surface, GREEN, scale_rect((x, y - 8, int(bar_w * health_ratio), 4), scale))
+            return [bar]
+        return []
+
+class Boss(Entity):
+    __slots__ = ('id', 'x', 'y', 'w', 'h', 'health', 'max_health', 'speed', 'direction', 'shoot_timer',
+                 'phase', 'emitters', 'px', 'py', 'rect')
 
-class Boss:
     def __init__(self):
+        self.id = next(ENTITY_IDS)
         self.x = WIDTH // 2 - 50
         self.y = -150
         self.w = 100
@@ -170,6 +353,10 @@ class Boss:
         self.direction = 1
         self.shoot_timer = 0
         self.phase = 1
+        self.emitters = {phase: [Emitter(BULLET_PATTERNS[name]) for name in names]
+                         for phase, names in BOSS_PATTERNS.items()}
+        self.px, self.py = self.x, self.y
+        self.rect = pygame.Rect(0, 0, 0, 0)
         
     def update(self):
         # Move boss
@@ -184,409 +371,1078 @@ class Boss:
         if self.health < self.max_health * 0.5:
             self.phase = 2
     
-    def draw(self):
+    def sprite_key(self):
+        return ('boss', self.phase)
+
+    @staticmethod
+    def build_sprite(phase, w=100, h=100):
+        surface = pygame.Surface((w, h), pygame.SRCALPHA)
+
         # Boss body
-        color = RED if self.phase == 1 else PURPLE
-        pygame.draw.rect(screen, color, (self.x, self.y, self.w, self.h))
-        pygame.draw.rect(screen, ORANGE, (self.x + 10, self.y + 10, self.w - 20, self.h - 20))
-        
+        color = RED if phase == 1 else PURPLE
+        pygame.draw.rect(surface, color, (0, 0, w, h))
+        pygame.draw.rect(surface, ORANGE, (10, 10, w - 20, h - 20))
+
         # Eyes
-        pygame.draw.circle(screen, YELLOW, (self.x + 30, self.y + 40), 10)
-        pygame.draw.circle(screen, YELLOW, (self.x + 70, self.y + 40), 10)
-        pygame.draw.circle(screen, RED, (self.x + 30, self.y + 40), 5)
-        pygame.draw.circle(screen, RED, (self.x + 70, self.y + 40), 5)
-        
-        # Health bar
+        pygame.draw.circle(surface, YELLOW, (30, 40), 10)
+        pygame.draw.circle(surface, YELLOW, (70, 40), 10)
+        pygame.draw.circle(surface, RED, (30, 40), 5)
+        pygame.draw.circle(surface, RED, (70, 40), 5)
+        return surface, (0, 0)
+
+    def draw_overlay(self, surface, x, y, detail=True, scale=1):
+        # Health bar; without detail just the remaining health
         bar_w = self.w
         health_ratio = self.health / self.max_health
-        pygame.draw.rect(screen, RED, (self.x, self.y - 15, bar_w, 8))
-        pygame.draw.rect(screen, GREEN, (self.x, self.y - 15, int(bar_w * health_ratio), 8))
-        pygame.draw.rect(screen, WHITE, (self.x, self.y - 15, bar_w, 8), 2)
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+        bar = scale_rect((x, y - 15, bar_w, 8), scale)
+        fill = scale_rect((x, y - 15, int(bar_w * health_ratio), 8), scale)
+        if not detail:
+            pygame.draw.rect(surface, GREEN, fill)
+            return [pygame.Rect(bar)]
+        rect = pygame.draw.rect(surface, RED, bar)
+        pygame.draw.rect(surface, GREEN, fill)
+        pygame.draw.rect(surface, WHITE, bar, line_width(2, scale))
+        return [rect]
     
-    def shoot(self):
-        bullets = []
-        if self.phase == 1:
-            # Simple shot pattern
-            bullets.append(EnemyBullet(self.x + self.w // 2, self.y + self.h))
-        else:
-            # Triple shot pattern
-            for angle in [-20, 0, 20]:
-                bullets.append(EnemyBullet(self.x + self.w // 2, self.y + self.h, angle))
-        return bullets
-
-class EnemyBullet:
-    def __init__(self, x, y, angle=0):
-        self.x = x
-        self.y = y
-        self.speed = 5
-        self.angle = angle
-        
-    def update(self):
-        self.y += self.speed * math.cos(math.radians(self.angle))
-        self.x += self.speed * math.sin(math.radians(self.angle))
-    
-    def draw(self):
-        pygame.draw.circle(screen, RED, (int(self.x), int(self.y)), 5)
-    
-    def get_rect(self):
-        return pygame.Rect(self.x - 5, self.y - 5, 10, 10)
+    def shoot(self, enemy_bullets, target=None):
+        # target is the point aimed patterns turn towards
+        for emitter in self.emitters[self.phase]:
+            emitter.fire(enemy_bullets, self.x + self.w // 2, self.y + self.h, target)
 
-class Particle:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.vx = random.uniform(-3, 3)
-        self.vy = random.uniform(-3, 3)
-        self.life = 30
-        self.color = color
-        self.size = random.randint(2, 5)
-    
-    def update(self):
-        self.x += self.vx
-        self.y += self.vy
-        self.life -= 1
-        self.size = max(1, self.size - 0.1)
-    
-    def draw(self):
-        if self.life > 0:
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(self.size))
+class PowerUp(Entity):
+    __slots__ = ('id', 'x', 'y', 'w', 'h', 'speed', 'type', 'px', 'py', 'rect')
 
-class PowerUp:
-    def __init__(self, x=None, y=None, ptype=None):
-        self.x = x if x is not None else random.randint(0, WIDTH - 30)
+    def __init__(self, x=None, y=None, ptype=None, rng=random):
+        self.id = next(ENTITY_IDS)
+        self.x = x if x is not None else rng.randint(0, WIDTH - 30)
         self.y = y if y is not None else -30
         self.w = 30
         self.h = 30
         self.speed = 2
-        self.type = ptype if ptype else random.choice(['health', 'rapid_fire', 'shield', 'weapon_up'])
+        self.type = ptype if ptype else rng.choice(POWERUP_TYPES)
+        self.px, self.py = self.x, self.y
+        self.rect = pygame.Rect(0, 0, 0, 0)
     
     def update(self):
         self.y += self.speed
     
-    def draw(self):
-        colors = {
-            'health': GREEN,
-            'rapid_fire': PURPLE,
-            'shield': CYAN,
-            'weapon_up': GOLD
-        }
-        color = colors.get(self.type, WHITE)
-        pygame.draw.circle(screen, color, (self.x + self.w // 2, self.y + self.h // 2), self.w // 2)
-        pygame.draw.circle(screen, WHITE, (self.x + self.w // 2, self.y + self.h // 2), self.w // 4)
-        
+    def sprite_key(self):
+        return ('powerup', self.type)
+
+    @staticmethod
+    def build_sprite(ptype, w=30, h=30):
+        surface = pygame.Surface((w + 1, h + 1), pygame.SRCALPHA)
+        color = POWERUP_COLORS.get(ptype, WHITE)
+        pygame.draw.circle(surface, color, (w // 2, h // 2), w // 2)
+        pygame.draw.circle(surface, WHITE, (w // 2, h // 2), w // 4)
+
         # Icon
-        center_x = self.x + self.w // 2
-        center_y = self.y + self.h // 2
-        if self.type == 'health':
-            pygame.draw.line(screen, WHITE, (center_x - 5, center_y), (center_x + 5, center_y), 2)
-            pygame.draw.line(screen, WHITE, (center_x, center_y - 5), (center_x, center_y + 5), 2)
-        elif self.type == 'weapon_up':
-            pygame.draw.polygon(screen, WHITE, [
+        center_x = w // 2
+        center_y = h // 2
+        if ptype == 'health':
+            pygame.draw.line(surface, WHITE, (center_x - 5, center_y), (center_x + 5, center_y), 2)
+            pygame.draw.line(surface, WHITE, (center_x, center_y - 5), (center_x, center_y + 5), 2)
+        elif ptype == 'weapon_up':
+            pygame.draw.polygon(surface, WHITE, [
                 (center_x, center_y - 5),
                 (center_x - 4, center_y + 5),
                 (center_x + 4, center_y + 5)
             ])
-    
-    def get_rect(self):
-        return pygame.Rect(self.x, self.y, self.w, self.h)
+        return surface, (0, 0)
 
-async def main():
-    running = True
-    player = Player()
-    bullets = []
-    enemies = []
-    enemy_bullets = []
-    particles = []
-    powerups = []
-    boss = None
-    
-    score = 0
-    combo = 0
-    combo_timer = 0
-    wave = 1
-    kills_this_wave = 0
-    
-    enemy_spawn_timer = 0
-    powerup_spawn_timer = 0
-    shoot_cooldown = 0
-    rapid_fire_timer = 0
-    boss_active = False
-    
-    game_over = False
-    font = pygame.font.Font(None, 36)
-    small_font = pygame.font.Font(None, 24)
-    tiny_font = pygame.font.Font(None, 18)
-    
-    while running:
-        clock.tick(FPS)
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN and game_over:
-                if event.key == pygame.K_r:
-                    # Restart game
-                    player = Player()
-                    bullets = []
-                    enemies = []
-                    enemy_bullets = []
-                    particles = []
-                    powerups = []
-                    boss = None
-                    score = 0
-                    combo = 0
-                    wave = 1
-                    kills_this_wave = 0
-                    boss_active = False
-                    game_over = False
-        
-        if not game_over:
-            keys = pygame.key.get_pressed()
-            player.move(keys)
-            
-            # Shooting
-            shoot_cooldown -= 1
-            fire_rate = 5 if rapid_fire_timer > 0 else 15
-            
-            if (keys[pygame.K_SPACE] or keys[pygame.K_j]) and shoot_cooldown <= 0:
+# Particle colors per effect, as arrays for bulk color picks
+BOSS_HIT_COLORS = np.array([ORANGE], np.uint8)
+BOSS_DEATH_COLORS = np.array([YELLOW, ORANGE, RED, PURPLE], np.uint8)
+KILL_COLORS = np.array([YELLOW, ORANGE, RED], np.uint8)
+PLAYER_HIT_COLORS = np.array([RED], np.uint8)
+PICKUP_COLORS = np.array([GREEN], np.uint8)
+
+# Broadphase kinds
+KIND_BULLET = 0
+KIND_ENEMY_BULLET = 1
+KIND_ENEMY = 2
+KIND_POWERUP = 3
+
+def blank_enemy(enemy_type):
+    # An enemy without the random position and speed, for a snapshot to fill in
+    e = Enemy.__new__(Enemy)
+    e.id = 0
+    e.type = enemy_type
+    e.color, e.w, e.h = ENEMY_STYLES[enemy_type]
+    e.x = e.y = e.px = e.py = e.speed = 0.0
+    e.health = e.max_health = 1
+    e.points = 0
+    e.behavior = 'straight'
+    e.vx = e.vy = e.hx = e.hy = 0.0
+    e.timer = 0
+    e.rect = pygame.Rect(0, 0, 0, 0)
+    return e
+
+SNAPSHOT_TYPES = SnapshotTypes(Player, blank_enemy, PowerUp, Boss, make_bullet_pool,
+                               make_enemy_bullet_pool, ENEMY_STYLES, POWERUP_TYPES, ENEMY_BEHAVIORS)
+
+class World:
+    # Complete simulation state. step() advances one tick without touching
+    # the display, so the game can be run headless as fast as the CPU allows.
+    # With several players (co-op) they share the score, wave and power-up
+    # timers; the game is over once every player is down.
+    def __init__(self, seed=None, particle_budget=PARTICLE_BUDGET, profiler=NULL_PROFILER, players=1):
+        # All gameplay randomness comes from self.rng, so a seed plus the
+        # per-tick inputs reproduce a run exactly. Particles use their own
+        # generator since they never affect gameplay.
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        self.particle_budget = particle_budget
+        # Multiplier on particles per explosion, lowered by the quality
+        # governor; particles never affect gameplay
+        self.effects_scale = 1.0
+        self.profiler = profiler
+        self.num_players = players
+        self.grid = SpatialHash()
+        self.neighbors = NeighborGrid(NEIGHBOR_RADIUS)
+        self.reset(seed)
+
+    @property
+    def player(self):
+        return self.players[0]
+
+    def live_players(self):
+        return [p for p in self.players if p.health > 0]
+
+    def reset(self, seed=None):
+        # Starts a run from `seed`. A restart draws the next run's seed from
+        # the current generator, so a whole session still replays from its
+        # first seed while each run can be reproduced alone by World(seed).
+        if seed is None:
+            seed = self.rng.randrange(2 ** 63)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+
+        n = self.num_players
+        # Spread evenly along the bottom; a single player starts centred
+        self.players = [Player(WIDTH * (2 * i + 1) // (2 * n) - (20 if n > 1 else 0)) for i in range(n)]
+        self.bullets = make_bullet_pool()
+        self.enemies = []
+        self.enemy_bullets = make_enemy_bullet_pool()
+        self.particles = ParticleSystem(self.particle_budget)
+        self.powerups = []
+        self.boss = None
+
+        self.score = 0
+        self.combo = 0
+        self.combo_timer = 0
+        self.wave = 1
+        self.kills_this_wave = 0
+
+        self.enemy_spawn_timer = 0
+        self.powerup_spawn_timer = 0
+        self.rapid_fire_timer = 0
+        self.boss_active = False
+
+        self.game_over = False
+        self.tick = 0
+        self.active = self.players
+
+        # Entities removed this tick; applied after all collision passes
+        self.dead = set()
+
+    def step(self, inputs):
+        # inputs: one bitmask per player, or a bare bitmask for one player
+        if not isinstance(inputs, (tuple, list)):
+            inputs = (inputs,)
+        if self.game_over:
+            if any(mask & INPUT_RESTART for mask in inputs):
+                self.reset()
+            return
+
+        prof = self.profiler
+        # Players down at the start of the tick sit it out; one knocked out
+        # mid-tick still finishes its collisions
+        self.active = self.live_players()
+        self.save_positions()
+        for player, mask in zip(self.players, inputs):
+            if player.health > 0:
+                player.move(mask)
+        self.update_weapons(inputs)
+        with prof.scope('spawn'):
+            self.spawn()
+        with prof.scope('move'):
+            self.move_entities()
+
+        with prof.scope('broadphase'):
+            self.build_broadphase()
+        with prof.scope('collide'):
+            self.collide_boss()
+            self.collide_enemy_bullets()
+            self.collide_enemies()
+            self.collide_powerups()
+            self.remove_dead()
+
+        with prof.scope('particles'):
+            self.update_particles()
+
+        # Check game over
+        if not self.live_players():
+            self.game_over = True
+        self.tick += 1
+
+    def state_hash(self):
+        # Short digest of the gameplay state, used to verify replays
+        p = self.player
+        state = (self.tick, self.score, self.wave, self.kills_this_wave, self.game_over,
+                 p.x, p.y, p.health, p.shield, p.weapon_level,
+                 len(self.enemies), len(self.bullets), len(self.enemy_bullets))
+        for p in self.players[1:]:
+            state += (p.x, p.y, p.health, p.shield, p.weapon_level)
+        return hashlib.blake2b(repr(state).encode(), digest_size=8).digest()
+
+    def snapshot(self):
+        # Versioned binary copy of the full state, see snapshot.py
+        return save_snapshot(self, SNAPSHOT_TYPES)
+
+    def restore(self, data):
+        load_snapshot(self, data, SNAPSHOT_TYPES)
+
+    def entity_counts(self):
+        return {
+            'enemies': len(self.enemies),
+            'bullets': len(self.bullets),
+            'enemy_bullets': len(self.enemy_bullets),
+            'particles': len(self.particles),
+            'powerups': len(self.powerups),
+        }
+
+    def save_positions(self):
+        # Start-of-tick positions of object entities, for render
+        # interpolation; pools track their own
+        for player in self.players:
+            player.px, player.py = player.x, player.y
+        if self.boss:
+            self.boss.px, self.boss.py = self.boss.x, self.boss.y
+        for e in self.enemies:
+            e.px, e.py = e.x, e.y
+        for p in self.powerups:
+            p.px, p.py = p.x, p.y
+
+    def update_weapons(self, inputs):
+        # Shooting
+        fire_rate = 5 if self.rapid_fire_timer > 0 else 15
+        bullets = self.bullets
+        for player, mask in zip(self.players, inputs):
+            if player.health <= 0:
+                continue
+            player.shoot_cooldown -= 1
+            if mask & INPUT_FIRE and player.shoot_cooldown <= 0:
                 if player.weapon_level == 1:
-                    bullets.append(Bullet(player.x + player.w // 2 - 2, player.y))
+                    spawn_bullet(bullets, player.x + player.w // 2 - 2, player.y)
                 elif player.weapon_level == 2:
-                    bullets.append(Bullet(player.x + player.w // 2 - 10, player.y))
-                    bullets.append(Bullet(player.x + player.w // 2 + 6, player.y))
+                    spawn_bullet(bullets, player.x + player.w // 2 - 10, player.y)
+                    spawn_bullet(bullets, player.x + player.w // 2 + 6, player.y)
                 elif player.weapon_level >= 3:
-                    bullets.append(Bullet(player.x + player.w // 2 - 10, player.y))
-                    bullets.append(Bullet(player.x + player.w // 2 - 2, player.y))
-                    bullets.append(Bullet(player.x + player.w // 2 + 6, player.y))
-                
-                shoot_cooldown = fire_rate
-            
-            rapid_fire_timer = max(0, rapid_fire_timer - 1)
-            combo_timer = max(0, combo_timer - 1)
-            if combo_timer == 0:
-                combo = 0
-            
-            # Boss wave every 5 waves
-            if wave % 5 == 0 and kills_this_wave >= 20 and not boss_active:
-                boss = Boss()
-                boss_active = True
-                enemies.clear()
-            
-            # Spawn enemies
-            if not boss_active:
-                enemy_spawn_timer += 1
-                spawn_rate = max(20, 40 - wave * 2)
-                
-                if enemy_spawn_timer > spawn_rate:
-                    # Random enemy type based on wave
-                    rand = random.random()
-                    if wave >= 3 and rand < 0.2:
-                        enemies.append(Enemy('tank'))
-                    elif wave >= 2 and rand < 0.5:
-                        enemies.append(Enemy('fast'))
-                    else:
-                        enemies.append(Enemy('normal'))
-                    enemy_spawn_timer = 0
-            
-            # Spawn powerups
-            powerup_spawn_timer += 1
-            if powerup_spawn_timer > 600:
-                powerups.append(PowerUp())
-                powerup_spawn_timer = 0
-            
-            # Update boss
-            if boss_active and boss:
-                boss.update()
-                boss.shoot_timer += 1
-                
-                shoot_rate = 30 if boss.phase == 1 else 20
-                if boss.shoot_timer > shoot_rate:
-                    enemy_bullets.extend(boss.shoot())
-                    boss.shoot_timer = 0
-                
-                # Check boss collision with bullets
-                for b in bullets[:]:
-                    if boss.get_rect().colliderect(b.get_rect()):
-                        boss.health -= 1
-                        if b in bullets:
-                            bullets.remove(b)
-                        for _ in range(5):
-                            particles.append(Particle(b.x, b.y, ORANGE))
-                
-                if boss.health <= 0:
-                    score += 500
-                    boss_active = False
-                    wave += 1
-                    kills_this_wave = 0
-                    for _ in range(50):
-                        particles.append(Particle(boss.x + boss.w // 2, boss.y + boss.h // 2, 
-                                                 random.choice([YELLOW, ORANGE, RED, PURPLE])))
-                    powerups.append(PowerUp(boss.x + boss.w // 2, boss.y + boss.h // 2, 'weapon_up'))
-                    boss = None
-            
-            # Update enemy bullets
-            for eb in enemy_bullets[:]:
-                eb.update()
-                if eb.y > HEIGHT or eb.x < 0 or eb.x > WIDTH:
-                    enemy_bullets.remove(eb)
-                elif eb.get_rect().colliderect(player.get_rect()):
-                    player.take_damage(10)
-                    enemy_bullets.remove(eb)
-                    for _ in range(8):
-                        particles.append(Particle(eb.x, eb.y, RED))
-            
-            # Update bullets
-            for b in bullets[:]:
-                b.update()
-                if b.y < 0 or b.x < 0 or b.x > WIDTH:
-                    bullets.remove(b)
-            
-            # Update enemies
-            for e in enemies[:]:
+                    spawn_bullet(bullets, player.x + player.w // 2 - 10, player.y)
+                    spawn_bullet(bullets, player.x + player.w // 2 - 2, player.y)
+                    spawn_bullet(bullets, player.x + player.w // 2 + 6, player.y)
+
+                player.shoot_cooldown = fire_rate
+
+        self.rapid_fire_timer = max(0, self.rapid_fire_timer - 1)
+        self.combo_timer = max(0, self.combo_timer - 1)
+        if self.combo_timer == 0:
+            self.combo = 0
+
+    def spawn(self):
+        # Boss wave every 5 waves
+        if self.wave % 5 == 0 and self.kills_this_wave >= 20 and not self.boss_active:
+            self.boss = Boss()
+            self.boss_active = True
+            self.enemies.clear()
+
+        # Spawn enemies
+        if not self.boss_active:
+            self.enemy_spawn_timer += 1
+            spawn_rate = max(20, 40 - self.wave * 2)
+
+            if self.enemy_spawn_timer > spawn_rate:
+                # Groups from wave 2, then a random enemy type based on wave
+                group = self.rng.random() if self.wave >= 2 else None
+                rand = self.rng.random()
+                if self.wave >= 4 and group < SWARM_CHANCE:
+                    self.spawn_swarm()
+                elif self.wave >= 2 and group >= 1 - FORMATION_CHANCE:
+                    self.spawn_formation()
+                elif self.wave >= 3 and rand < 0.2:
+                    self.enemies.append(Enemy('tank', self.rng))
+                elif self.wave >= 2 and rand < 0.5:
+                    self.enemies.append(Enemy('fast', self.rng))
+                else:
+                    e = Enemy('normal', self.rng)
+                    if self.wave >= 3 and self.rng.random() < DIVE_CHANCE:
+                        e.behavior = 'dive'
+                    self.enemies.append(e)
+                self.enemy_spawn_timer = 0
+
+            if self.wave >= 3:
+                members = [e for e in self.enemies if e.behavior == 'formation' and e.y > 0]
+                if members and self.rng.random() < PEEL_CHANCE:
+                    e = self.rng.choice(members)
+                    e.behavior, e.timer = 'dive', 0
+
+        # Spawn powerups
+        self.powerup_spawn_timer += 1
+        if self.powerup_spawn_timer > 600:
+            self.powerups.append(PowerUp(rng=self.rng))
+            self.powerup_spawn_timer = 0
+
+    def spawn_formation(self):
+        # A V of normal enemies with the leader at the point; hx and hy are
+        # each member's slot when the formation starts
+        half = FORMATION_SIZE // 2
+        margin = half * FORMATION_SPACING[0] + FORMATION_SWAY
+        ox = self.rng.uniform(margin, WIDTH - margin - ENEMY_STYLES['normal'][1])
+        for k in range(-half, half + 1):
+            e = Enemy('normal', self.rng)
+            e.behavior = 'formation'
+            e.hx = ox + k * FORMATION_SPACING[0]
+            e.hy = -40 - abs(k) * FORMATION_SPACING[1]
+            e.x, e.y = e.px, e.py = e.hx, e.hy
+            e.vx, e.vy = 0.0, FORMATION_DESCENT
+            self.enemies.append(e)
+
+    def spawn_swarm(self):
+        # A loose cloud of fast enemies that flock from then on
+        cx = self.rng.uniform(100, WIDTH - 140)
+        for _ in range(SWARM_SIZE):
+            e = Enemy('fast', self.rng)
+            e.behavior = 'flock'
+            e.x = e.px = cx + self.rng.uniform(-60, 60)
+            e.y = e.py = self.rng.uniform(-160, -40)
+            e.vy = e.speed / 2
+            self.enemies.append(e)
+
+    def steer_enemies(self, enemies):
+        # One vectorized pass over every non-straight enemy. Neighbours come
+        # from a grid shared by all behaviours, so a swarm costs O(n) per
+        # tick plus its close pairs instead of O(n^2).
+        n = len(enemies)
+        x = np.fromiter((e.x for e in enemies), float, n)
+        y = np.fromiter((e.y for e in enemies), float, n)
+        vx = np.fromiter((e.vx for e in enemies), float, n)
+        vy = np.fromiter((e.vy for e in enemies), float, n)
+        hx = np.fromiter((e.hx for e in enemies), float, n)
+        hy = np.fromiter((e.hy for e in enemies), float, n)
+        timer = np.fromiter((e.timer for e in enemies), np.int64, n)
+        speed = np.fromiter((e.speed for e in enemies), float, n)
+        w = np.fromiter((e.w for e in enemies), float, n)
+        h = np.fromiter((e.h for e in enemies), float, n)
+        behavior = np.fromiter((ENEMY_BEHAVIORS.index(e.behavior) for e in enemies), np.int64, n)
+        formation = behavior == ENEMY_BEHAVIORS.index('formation')
+        dive = behavior == ENEMY_BEHAVIORS.index('dive')
+        flock = behavior == ENEMY_BEHAVIORS.index('flock')
+
+        cx, cy = x + w / 2, y + h / 2
+        grid = self.neighbors
+        if np.count_nonzero(~formation) > 1:
+            grid.build(cx, cy)
+        else:
+            # Formations ignore their neighbours, so they alone need no query
+            grid.build(cx[:0], cy[:0])
+        i, j, dx, dy, d2 = grid.pairs(NEIGHBOR_RADIUS)
+        close = d2 < SEPARATION_RADIUS ** 2
+        sx, sy = separation(n, i[close], dx[close], dy[close], d2[close])
+        # Formations keep their own spacing
+        sx = np.where(formation, 0.0, sx * SEPARATION_WEIGHT)
+        sy = np.where(formation, 0.0, sy * SEPARATION_WEIGHT)
+
+        p = (self.live_players() or self.players)[0]
+        px, py = p.x + p.w / 2, p.y + p.h / 2
+
+        # Formation: seek the slot, which sways and descends with the timer
+        phase = 2 * math.pi * timer / FORMATION_PERIOD
+        slot_x = hx + FORMATION_SWAY * np.sin(phase) - x
+        slot_y = hy + FORMATION_DESCENT * timer - y
+        want_x, want_y = clamp_length(slot_x, slot_y, np.maximum(speed, 2 * FORMATION_DESCENT))
+
+        # Dive: drift down at half speed, then pick the player's position
+        # as the target and swoop at it; once past it, carry on down
+        start = dive & (timer == 0) & (y >= DIVE_START_Y)
+        hx = np.where(start, px - w / 2, hx)
+        hy = np.where(start, py - h / 2, hy)
+        timer = np.where(start, 1, timer)
+        swooping = dive & (timer > 0) & (y < hy)
+        aim = np.maximum(np.hypot(hx - x, hy - y), 1e-9)
+        want_x = np.where(dive, np.where(swooping, (hx - x) / aim * speed, 0.0), want_x)
+        want_y = np.where(dive, np.where(swooping, (hy - y) / aim * speed,
+                                         np.where(timer > 0, speed, speed / 2)), want_y)
+
+        # Flock: head down the screen, drifting towards the player
+        want_x = np.where(flock, (px - cx) * PLAYER_PULL * speed, want_x)
+        want_y = np.where(flock, speed, want_y)
+        coh_x, coh_y, align_x, align_y = flock_terms(n, i, j, cx, cy, vx, vy, flock)
+
+        ax = sx + np.where(flock, GOAL_WEIGHT, 1.0) * (want_x - vx)
+        ay = sy + np.where(flock, GOAL_WEIGHT, 1.0) * (want_y - vy)
+        ax += COHESION_WEIGHT * coh_x + ALIGNMENT_WEIGHT * align_x
+        ay += COHESION_WEIGHT * coh_y + ALIGNMENT_WEIGHT * align_y
+        ax, ay = clamp_length(ax, ay, np.where(dive, DIVE_TURN, MAX_STEER))
+        vx, vy = clamp_length(vx + ax, vy + ay, speed)
+
+        x = x + vx
+        y = y + vy
+        # Walls stop sideways drift
+        wall = (x < 0) | (x > WIDTH - w)
+        x = np.clip(x, 0, WIDTH - w)
+        vx = np.where(wall, 0.0, vx)
+        # Formation timers always run; a diver's starts with its swoop
+        timer = np.where(dive & (timer == 0), 0, timer + 1)
+
+        for e, ex, ey, evx, evy, ehx, ehy, et in zip(
+                enemies, x.tolist(), y.tolist(), vx.tolist(), vy.tolist(),
+                hx.tolist(), hy.tolist(), timer.tolist()):
+            e.x, e.y, e.vx, e.vy, e.hx, e.hy, e.timer = ex, ey, evx, evy, ehx, ehy, et
+
+    def move_entities(self):
+        dead = self.dead
+        boss = self.boss
+        if self.boss_active and boss:
+            boss.update()
+            boss.shoot_timer += 1
+
+            shoot_rate = 30 if boss.phase == 1 else 20
+            if boss.shoot_timer > shoot_rate:
+                # Aimed patterns go for the first player still standing
+                p = (self.live_players() or self.players)[0]
+                boss.shoot(self.enemy_bullets, (p.x + p.w / 2, p.y + p.h / 2))
+                boss.shoot_timer = 0
+
+        # Pools move, age and cull off-screen entries in one vectorized pass
+        self.enemy_bullets.update()
+        self.bullets.update()
+
+        steered = [e for e in self.enemies if e.behavior != 'straight']
+        if steered:
+            self.steer_enemies(steered)
+        for e in self.enemies:
+            if e.behavior == 'straight':
                 e.update()
-                if e.y > HEIGHT:
-                    enemies.remove(e)
-                    combo = 0
-                
-                # Check collision with player
-                if e.get_rect().colliderect(player.get_rect()):
-                    player.take_damage(20)
-                    enemies.remove(e)
-                    combo = 0
-                    for _ in range(15):
-                        particles.append(Particle(e.x + e.w // 2, e.y + e.h // 2, RED))
-                
-                # Check collision with bullets
-                for b in bullets[:]:
-                    if e.get_rect().colliderect(b.get_rect()):
-                        e.health -= 1
-                        if b in bullets:
-                            bullets.remove(b)
-                        
-                        if e.health <= 0:
-                            combo += 1
-                            combo_timer = 120
-                            combo_bonus = combo * 2
-                            score += e.points + combo_bonus
-                            kills_this_wave += 1
-                            
-                            if e in enemies:
-                                enemies.remove(e)
-                            for _ in range(20):
-                                particles.append(Particle(e.x + e.w // 2, e.y + e.h // 2, 
-                                                        random.choice([YELLOW, ORANGE, RED])))
-                            
-                            # Check for wave completion
-                            if kills_this_wave >= 30 and not boss_active and wave % 5 != 0:
-                                wave += 1
-                                kills_this_wave = 0
-            
-            # Update powerups
-            for p in powerups[:]:
-                p.update()
-                if p.y > HEIGHT:
-                    powerups.remove(p)
-                
-                if p.get_rect().colliderect(player.get_rect()):
-                    if p.type == 'health':
-                        player.health = min(player.max_health, player.health + 30)
-                    elif p.type == 'rapid_fire':
-                        rapid_fire_timer = 300
-                    elif p.type == 'shield':
-                        player.shield = min(player.max_shield, player.shield + 30)
-                    elif p.type == 'weapon_up':
-                        player.weapon_level = min(3, player.weapon_level + 1)
-                    
-                    powerups.remove(p)
-                    for _ in range(10):
-                        particles.append(Particle(p.x, p.y, GREEN))
-            
-            # Update particles
-            for p in particles[:]:
-                p.update()
-                if p.life <= 0:
-                    particles.remove(p)
-            
-            # Check game over
-            if player.health <= 0:
-                game_over = True
-        
-        # Draw everything
-        screen.fill(BLACK)
-        
-        # Draw stars
-        for i in range(50):
+            if e.y > HEIGHT:
+                dead.add(e)
+                self.combo = 0
+
+        for p in self.powerups:
+            p.update()
+            if p.y > HEIGHT:
+                dead.add(p)
+
+    def build_broadphase(self):
+        grid = self.grid
+        dead = self.dead
+        grid.clear()
+        grid.insert_pool(KIND_BULLET, self.bullets)
+        grid.insert_pool(KIND_ENEMY_BULLET, self.enemy_bullets)
+        for kind, entities in ((KIND_ENEMY, self.enemies),
+                               (KIND_POWERUP, self.powerups)):
+            for obj in entities:
+                if obj not in dead:
+                    grid.insert(kind, obj, obj.get_rect())
+
+    def collide_boss(self):
+        boss = self.boss
+        if not (self.boss_active and boss):
+            return
+
+        # Check boss collision with bullets
+        bullets = self.bullets
+        for i, _ in self.grid.query(KIND_BULLET, boss.get_rect()):
+            if bullets.is_dead(i):
+                continue
+            boss.health -= int(bullets.damage[i])
+            bullets.kill(i)
+            self.burst(bullets.x[i], bullets.y[i], 5, BOSS_HIT_COLORS)
+
+        if boss.health <= 0:
+            self.score += 500
+            self.boss_active = False
+            self.wave += 1
+            self.kills_this_wave = 0
+            self.burst(boss.x + boss.w // 2, boss.y + boss.h // 2, 50, BOSS_DEATH_COLORS)
+            self.powerups.append(PowerUp(boss.x + boss.w // 2, boss.y + boss.h // 2, 'weapon_up', self.rng))
+            self.boss = None
+
+    def collide_enemy_bullets(self):
+        enemy_bullets = self.enemy_bullets
+        for player in self.active:
+            for i, _ in self.grid.query(KIND_ENEMY_BULLET, player.get_rect()):
+                if enemy_bullets.is_dead(i):
+                    continue
+                player.take_damage(int(enemy_bullets.damage[i]))
+                enemy_bullets.kill(i)
+                self.burst(enemy_bullets.x[i], enemy_bullets.y[i], 8, PLAYER_HIT_COLORS)
+
+    def collide_enemies(self):
+        grid = self.grid
+        dead = self.dead
+
+        # Check collision with players
+        for player in self.active:
+            for e, _ in grid.query(KIND_ENEMY, player.get_rect()):
+                if e in dead:
+                    continue
+                player.take_damage(20)
+                dead.add(e)
+                self.combo = 0
+                self.burst(e.x + e.w // 2, e.y + e.h // 2, 15, PLAYER_HIT_COLORS)
+
+        # Check collision with bullets
+        bullets = self.bullets
+        for e in self.enemies:
+            if e in dead:
+                continue
+            for i, _ in grid.query(KIND_BULLET, e.get_rect()):
+                if bullets.is_dead(i):
+                    continue
+                e.health -= int(bullets.damage[i])
+                bullets.kill(i)
+
+                if e.health <= 0:
+                    self.combo += 1
+                    self.combo_timer = 120
+                    combo_bonus = self.combo * 2
+                    self.score += e.points + combo_bonus
+                    self.kills_this_wave += 1
+
+                    dead.add(e)
+                    self.burst(e.x + e.w // 2, e.y + e.h // 2, 20, KILL_COLORS)
+
+                    # Check for wave completion
+                    if self.kills_this_wave >= 30 and not self.boss_active and self.wave % 5 != 0:
+                        self.wave += 1
+                        self.kills_this_wave = 0
+                    break
+
+    def collide_powerups(self):
+        for player in self.active:
+            for p, _ in self.grid.query(KIND_POWERUP, player.get_rect()):
+                if p in self.dead:
+                    continue
+                if p.type == 'health':
+                    player.health = min(player.max_health, player.health + 30)
+                elif p.type == 'rapid_fire':
+                    self.rapid_fire_timer = 300
+                elif p.type == 'shield':
+                    player.shield = min(player.max_shield, player.shield + 30)
+                elif p.type == 'weapon_up':
+                    player.weapon_level = min(3, player.weapon_level + 1)
+
+                self.dead.add(p)
+                self.burst(p.x, p.y, 10, PICKUP_COLORS)
+
+    def remove_dead(self):
+        # Deferred removal: one filtering pass per list instead of list.remove mid-scan
+        self.bullets.compact()
+        self.enemy_bullets.compact()
+        dead = self.dead
+        if not dead:
+            return
+        self.enemies = [e for e in self.enemies if e not in dead]
+        self.powerups = [p for p in self.powerups if p not in dead]
+        dead.clear()
+
+    def burst(self, x, y, count, colors):
+        # Spawns an explosion of particles in one bulk pool write
+        if self.effects_scale != 1.0:
+            count = max(1, int(count * self.effects_scale))
+        rng = self.np_rng
+        self.particles.spawn_many(x, y,
+                                  rng.uniform(-3, 3, count), rng.uniform(-3, 3, count),
+                                  30, rng.integers(2, 6, count),
+                                  colors[rng.integers(0, len(colors), count)])
+
+    def update_particles(self):
+        self.particles.update()
+
+# Sprite atlas: builders by key kind, and every key the game can ask for
+SPRITE_BUILDERS = {
+    'player': Player.build_sprite,
+    'enemy': Enemy.build_sprite,
+    'boss': Boss.build_sprite,
+    'powerup': PowerUp.build_sprite,
+    'bullet': build_bullet_sprite,
+    'enemy_bullet': build_enemy_bullet_sprite,
+}
+SPRITE_KEYS = (
+    [('player', level) for level in (1, 2, 3)]
+    + [('enemy', t) for t in ENEMY_STYLES]
+    + [('boss', phase) for phase in (1, 2)]
+    + [('powerup', t) for t in POWERUP_COLORS]
+    + [('bullet',), ('enemy_bullet',)]
+)
+ATLAS_VERSION = 1
+ATLAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'sprites.png')
+
+# How many of the best runs the game over screen lists; the high-score log
+# is in LEADERBOARD_DIR, which leaderboard.py's commands default to as well
+LEADERBOARD_ROWS = 5
+
+def load_atlas(path=ATLAS_PATH):
+    # Loads the cached atlas, regenerating and saving it when missing or stale
+    atlas = SpriteAtlas.load(path, SPRITE_BUILDERS, ATLAS_VERSION)
+    atlas.build(SPRITE_KEYS)
+    if atlas.dirty:
+        try:
+            atlas.save(path)
+        except (OSError, pygame.error):
+            pass
+    atlas.convert()
+    return atlas
+
+def lerp_position(e, alpha):
+    if alpha == 1.0:
+        return e.x, e.y
+    return e.px + (e.x - e.px) * alpha, e.py + (e.y - e.py) * alpha
+
+def pool_positions(pool, alpha, scale=1):
+    n = pool.count
+    x = pool.x[:n]
+    y = pool.y[:n]
+    if alpha != 1.0:
+        px = pool.px[:n]
+        py = pool.py[:n]
+        x = px + (x - px) * alpha
+        y = py + (y - py) * alpha
+    if scale != 1:
+        x = x * scale
+        y = y * scale
+    return x.tolist(), y.tolist()
+
+class Renderer:
+    # Draws a World onto a surface; owns the HUD and render caches. With a
+    # DirtyRectTracker only last frame's regions are erased, and draw()
+    # returns the regions to present (None means present the whole frame).
+    # Worlds are in logical coordinates (WIDTH x HEIGHT); `scale` is the
+    # render scale, so the target surface should be the logical size times
+    # it (see viewport.Viewport).
+    def __init__(self, atlas=None, dirty=None, profiler=NULL_PROFILER, scale=1):
+        self.scale = scale
+        self.hud = Hud((WIDTH, HEIGHT), scale, LEADERBOARD_ROWS)
+        atlas = atlas if atlas is not None else SpriteAtlas(SPRITE_BUILDERS, ATLAS_VERSION)
+        self.atlas = atlas if scale == 1 else ScaledAtlas(atlas, scale)
+        self.particles = ParticleRenderer(scale)
+        self.dirty = dirty
+        self.profiler = profiler
+        self.quality = QUALITY_TIERS[0]
+        # Milliseconds the background stars scroll by; wall time when
+        # playing, the tick count when exporting frames faster than that
+        self.clock = pygame.time.get_ticks
+
+    def clear(self, surface):
+        regions = self.dirty.erase_regions() if self.dirty else None
+        if regions is None:
+            surface.fill(BLACK)
+        else:
+            for r in regions:
+                surface.fill(BLACK, r)
+
+    def draw(self, surface, world, alpha=1.0):
+        # alpha interpolates between each entity's start-of-tick and current
+        # position (see pacing.FixedTimestep)
+        prof = self.profiler
+        with prof.scope('draw.clear'):
+            self.clear(surface)
+        rects = []
+
+        with prof.scope('draw.sprites'):
+            self.draw_stars(surface, rects)
+            self.draw_ships(surface, world, alpha, rects)
+
+        with prof.scope('draw.particles'):
+            rects += self.particles.draw(surface, world.particles, alpha)
+
+        with prof.scope('draw.sprites'):
+            rects += surface.blits([self.atlas.item(p.sprite_key(), *lerp_position(p, alpha))
+                                    for p in world.powerups])
+
+        with prof.scope('draw.hud'):
+            rects += self.hud.draw(surface, world)
+
+        if prof.overlay_visible:
+            rects.append(prof.draw_overlay(surface, load_font(max(1, round(20 * self.scale))),
+                                           (int((WIDTH - 290) * self.scale), int(40 * self.scale))))
+
+        if self.dirty is None:
+            return None
+        return self.dirty.present(rects)
+
+    def draw_stars(self, surface, rects):
+        scale = self.scale
+        radius = max(1, int(scale))
+        for i in range(self.quality.stars):
             x = (i * 123) % WIDTH
-            y = (i * 456 + pygame.time.get_ticks() // 10) % HEIGHT
-            pygame.draw.circle(screen, WHITE, (x, y), 1)
-        
-        player.draw()
-        
-        for b in bullets:
-            b.draw()
-        
-        for eb in enemy_bullets:
-            eb.draw()
-        
-        for e in enemies:
-            e.draw()
-        
-        if boss_active and boss:
-            boss.draw()
-        
-        for p in particles:
-            p.draw()
-        
-        for pw in powerups:
-            pw.draw()
-        
-        # Draw UI
-        score_text = small_font.render(f"Score: {score}", True, WHITE)
-        screen.blit(score_text, (10, 10))
-        
-        wave_text = small_font.render(f"Wave: {wave}", True, WHITE)
-        screen.blit(wave_text, (WIDTH - 120, 10))
-        
-        if combo > 1:
-            combo_text = font.render(f"x{combo} COMBO!", True, GOLD)
-            screen.blit(combo_text, (WIDTH // 2 - 80, 50))
-        
-        # Health bar
-        pygame.draw.rect(screen, RED, (10, 40, 200, 20))
-        pygame.draw.rect(screen, GREEN, (10, 40, int(200 * player.health / player.max_health), 20))
-        pygame.draw.rect(screen, WHITE, (10, 40, 200, 20), 2)
-        
-        # Shield bar
-        if player.shield > 0:
-            pygame.draw.rect(screen, (0, 100, 150), (10, 65, 200, 15))
-            pygame.draw.rect(screen, CYAN, (10, 65, int(200 * player.shield / player.max_shield), 15))
-            pygame.draw.rect(screen, WHITE, (10, 65, 200, 15), 2)
-        
-        if rapid_fire_timer > 0:
-            rapid_text = small_font.render("RAPID FIRE!", True, PURPLE)
-            screen.blit(rapid_text, (10, 85))
-        
-        if boss_active:
-            boss_text = font.render("BOSS BATTLE!", True, RED)
-            screen.blit(boss_text, (WIDTH // 2 - 100, 10))
-        
-        if game_over:
-            game_over_text = font.render("GAME OVER", True, RED)
-            score_text = font.render(f"Final Score: {score}", True, WHITE)
-            wave_text_final = small_font.render(f"Reached Wave: {wave}", True, WHITE)
-            restart_text = small_font.render("Press R to Restart", True, WHITE)
-            
-            screen.blit(game_over_text, (WIDTH // 2 - 100, HEIGHT // 2 - 80))
-            screen.blit(score_text, (WIDTH // 2 - 120, HEIGHT // 2 - 30))
-            screen.blit(wave_text_final, (WIDTH // 2 - 100, HEIGHT // 2 + 10))
-            screen.blit(restart_text, (WIDTH // 2 - 100, HEIGHT // 2 + 50))
-        
-        pygame.display.flip()
+            y = (i * 456 + self.clock() // 10) % HEIGHT
+            rects.append(pygame.draw.circle(surface, WHITE, (int(x * scale), int(y * scale)), radius))
+
+    def draw_ships(self, surface, world, alpha, rects):
+        # Players, bullets, enemies and boss, in that layer order. Downed
+        # co-op players disappear; at game over everyone stays on screen.
+        atlas = self.atlas
+        quality = self.quality
+        scale = self.scale
+        for player in world.live_players() or world.players:
+            x, y = lerp_position(player, alpha)
+            # Level 1 is the sprite without weapon pips
+            key = player.sprite_key() if quality.weapon_pips else ('player', 1)
+            rects.append(surface.blit(*atlas.item(key, x, y)))
+            if quality.shield_ring:
+                rects += player.draw_overlay(surface, x, y, scale)
+
+        sprite, (ox, oy) = atlas.get(('bullet',))
+        xs, ys = pool_positions(world.bullets, alpha, scale)
+        rects += surface.blits((sprite, (x + ox, y + oy)) for x, y in zip(xs, ys))
+
+        sprite, (ox, oy) = atlas.get(('enemy_bullet',))
+        xs, ys = pool_positions(world.enemy_bullets, alpha, scale)
+        rects += surface.blits((sprite, (int(x) + ox, int(y) + oy)) for x, y in zip(xs, ys))
+
+        enemies = [(e, *lerp_position(e, alpha)) for e in world.enemies]
+        rects += surface.blits(atlas.item(e.sprite_key(), x, y) for e, x, y in enemies)
+        for e, x, y in enemies:
+            rects += e.draw_overlay(surface, x, y, scale)
+
+        boss = world.boss
+        if world.boss_active and boss:
+            x, y = lerp_position(boss, alpha)
+            rects.append(surface.blit(*atlas.item(boss.sprite_key(), x, y)))
+            rects += boss.draw_overlay(surface, x, y, quality.boss_detail, scale)
+
+class Session:
+    # The per-tick logic main() runs around World.step: input recording,
+    # rewind history, quick-save/load and leaderboard logging. Key presses
+    # that touch the world are queued with command() and applied at the
+    # start of the next tick, so with --pipeline all of it runs on the
+    # simulation thread.
+    def __init__(self, world, recorder=None, history=None, board=None, hud=None):
+        self.world = world
+        self.recorder = recorder
+        self.history = history
+        self.board = board
+        self.hud = hud
+        self.commands = deque()
+        self.rewinding = False
+        self.quick_save = None
+        # Each run is logged once, when it ends; runs that were rewound or
+        # quick-loaded aren't logged
+        self.run_logged = self.assisted = False
+
+    def command(self, name):
+        # 'save' or 'load'
+        self.commands.append(name)
+
+    def tick(self, inputs):
+        world = self.world
+        history = self.history
+        while self.commands:
+            name = self.commands.popleft()
+            # Rewinding and quick-loading would desync a recording, so they
+            # are off while recording
+            if name == 'save' and not self.recorder:
+                self.quick_save = world.snapshot()
+            elif name == 'load' and self.quick_save:
+                world.restore(self.quick_save)
+                self.assisted = True
+                if history:
+                    history.clear()
+
+        if self.rewinding and history is not None:
+            # One tick back per tick held
+            self.assisted |= history.rewind(world)
+            return
+        if world.game_over and inputs & INPUT_RESTART:
+            self.run_logged = self.assisted = False
+        if self.recorder:
+            self.recorder.record(inputs)
+        if history is not None:
+            history.push(world)
+        world.step(inputs)
+
+        board = self.board
+        if board and world.game_over and not self.run_logged:
+            rank = None if self.assisted else board.submit(world.score, world.wave, world.tick, world.seed)
+            if self.hud:
+                self.hud.set_leaderboard(board.best(LEADERBOARD_ROWS), rank)
+            self.run_logged = True
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Space Defender")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="present only the changed screen regions instead of flipping the full frame")
+    parser.add_argument('--dirty-threshold', type=float, default=0.5,
+                        help="dirty fraction of the screen above which a full frame is presented")
+    parser.add_argument('--max-fps', type=int, default=None,
+                        help="render frame cap; defaults to the desktop refresh rate, 0 for uncapped")
+    parser.add_argument('--pacing-stats', action='store_true',
+                        help="print frame pacing statistics on exit, with --dirty-rects also "
+                             "how many frames were presented in part and in full")
+    parser.add_argument('--seed', type=seed, default=None,
+                        help="seed for the game's random number generator")
+    parser.add_argument('--record', metavar='PATH',
+                        help="record the session's inputs for replay.py")
+    parser.add_argument('--profile', action='store_true',
+                        help="collect per-phase timings from the start and print them with "
+                             "histograms on exit (F3 toggles the overlay)")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="write a Chrome trace-event JSON of every timed scope on exit")
+    parser.add_argument('--profile-csv', metavar='PATH',
+                        help="write per-frame phase timings as CSV on exit")
+    parser.add_argument('--rewind-ticks', type=int, default=180,
+                        help="ticks of history kept for rewinding with Backspace; 0 turns it off")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="print the time from process start to the first presented frame")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="run the simulation on its own thread, drawing its latest published frame; "
+                             "simulation phases aren't profiled in this mode")
+    parser.add_argument('--quality', choices=['auto'] + [t.name for t in QUALITY_TIERS], default='auto',
+                        help="effects detail; 'auto' steps it down while frames run over budget")
+    parser.add_argument('--quality-report', action='store_true',
+                        help="print the time spent in each quality tier on exit")
+    parser.add_argument('--alloc-report', action='store_true',
+                        help="trace allocations per frame by site and log garbage collection pauses")
+    parser.add_argument('--alloc-budget', type=float, default=64, metavar='KIB',
+                        help="transient allocation per frame above which --alloc-report counts a frame over budget")
+    parser.add_argument('--leaderboard', metavar='DIR', default=LEADERBOARD_DIR,
+                        help="directory of the high-score log (see leaderboard.py); empty to turn it off")
+    parser.add_argument('--render-scale', type=render_scale, default=1.0, metavar='SCALE',
+                        help=f"draw at SCALE times the {WIDTH}x{HEIGHT} playfield, then scale to the window "
+                             f"({RENDER_SCALE_RANGE[0]:g}-{RENDER_SCALE_RANGE[1]:g})")
+    parser.add_argument('--window', type=window_size, metavar='WxH',
+                        help=f"window size (default {WIDTH}x{HEIGHT}); shrunk to fit the desktop")
+    parser.add_argument('--fullscreen', action='store_true', help="fill the desktop")
+    parser.add_argument('--smooth-scale', action='store_true',
+                        help="filter when scaling frames to the window instead of nearest neighbour")
+    return parser.parse_args(argv)
+
+def render_scale(text):
+    scale = float(text)
+    low, high = RENDER_SCALE_RANGE
+    if not low <= scale <= high:
+        raise argparse.ArgumentTypeError(f"render scale must be between {low:g} and {high:g}")
+    return scale
+
+def window_size(text):
+    try:
+        w, h = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError(f"window size must be positive, got {text!r}")
+    return w, h
+
+def seed(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer seed, got {text!r}")
+    if not 0 <= value <= MAX_SEED:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and {MAX_SEED}")
+    return value
+
+def process_age():
+    # Seconds since the process started, or None where the OS won't say.
+    # Linux only: /proc/self/stat field 22 is the start time in clock ticks
+    # since boot.
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def print_startup_report(marks):
+    # marks: [(phase, perf_counter at its end)] in order
+    print("startup:")
+    age = process_age()
+    origin = last = IMPORT_STARTED
+    if age is not None:
+        # Interpreter startup, before this module began importing
+        origin = time.perf_counter() - age
+        print(f"  {'interpreter':<14} {(IMPORT_STARTED - origin) * 1000:8.1f} ms")
+    for name, t in marks:
+        print(f"  {name:<14} {(t - last) * 1000:8.1f} ms")
+        last = t
+    print(f"  {'total':<14} {(last - origin) * 1000:8.1f} ms"
+          + ("" if age is not None else " (from import; process start unknown)"))
+
+def init_pygame():
+    # Only the subsystems the game uses; pygame.init() would also start the
+    # mixer and joystick support, which cost startup time for nothing
+    pygame.display.init()
+    pygame.font.init()
+
+def open_window(size, fullscreen=False):
+    # Fullscreen at the desktop resolution, or a resizable window of `size`
+    # shrunk (keeping its shape) to fit the desktop
+    if fullscreen:
+        return pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    try:
+        desktop = pygame.display.get_desktop_sizes()[0]
+    except (AttributeError, IndexError, pygame.error):
+        desktop = None
+    if desktop and (size[0] > desktop[0] or size[1] > desktop[1]):
+        size = fit(size, desktop)
+    return pygame.display.set_mode(size, pygame.RESIZABLE)
+
+def display_refresh_rate():
+    # Desktop refresh rate where pygame can report it, else the tick rate
+    try:
+        rates = pygame.display.get_desktop_refresh_rates()
+    except (AttributeError, pygame.error):
+        rates = []
+    return max(rates) if rates and max(rates) > 0 else FPS
+
+async def main(args=None):
+    if args is None:
+        args = parse_args([])
+    startup = [('imports', time.perf_counter())]
+    init_pygame()
+    startup.append(('pygame init', time.perf_counter()))
+    viewport = Viewport((WIDTH, HEIGHT), args.render_scale, args.smooth_scale)
+    viewport.attach(open_window(args.window or (WIDTH, HEIGHT), args.fullscreen))
+    pygame.display.set_caption("Space Defender - Enhanced")
+    startup.append(('display', time.perf_counter()))
+
+    running = True
+    profiler = Profiler(enabled=args.profile or bool(args.profile_csv), tracing=bool(args.trace),
+                        keep_frames=bool(args.profile_csv))
+    # The profiler isn't thread-safe, so a pipelined world doesn't report to it
+    world = World(args.seed, profiler=NULL_PROFILER if args.pipeline else profiler)
+    recorder = InputRecorder(args.record, world.seed) if args.record else None
+    history = SnapshotRing(args.rewind_ticks) if args.rewind_ticks > 0 and not recorder else None
+    dirty = DirtyRectTracker(viewport.size, full_threshold=args.dirty_threshold) if args.dirty_rects else None
+    renderer = Renderer(load_atlas(), dirty, profiler, args.render_scale)
+    startup.append(('assets', time.perf_counter()))
+    board = None
+    if args.leaderboard:
+        try:
+            board = Leaderboard(args.leaderboard)
+        except (OSError, LeaderboardError) as e:
+            # Scores are a nicety; play on without them
+            print(f"leaderboard disabled: {e}")
+    session = Session(world, recorder, history, board, renderer.hud)
+
+    clock = pygame.time.Clock()
+    max_fps = args.max_fps if args.max_fps is not None else display_refresh_rate()
+    if args.pipeline:
+        # The world belongs to the simulation thread from here on; this
+        # thread only draws the frames it publishes
+        sim = SimulationThread(world, session.tick, FPS, MAX_CATCHUP_STEPS)
+        pacer = sim.pacer
+        sim.start()
+    else:
+        sim = None
+        pacer = FixedTimestep(FPS, MAX_CATCHUP_STEPS, max_fps)
+    if args.quality == 'auto':
+        governor = QualityGovernor(1.0 / (max_fps or FPS))
+    else:
+        governor = None
+        renderer.quality = next(t for t in QUALITY_TIERS if t.name == args.quality)
+        world.effects_scale = renderer.quality.particle_scale
+    allocs = AllocationMonitor(budget=args.alloc_budget * 1024) if args.alloc_report else None
+    if allocs:
+        allocs.start()
+    # Everything allocated so far (modules, assets, sprite caches) lives for
+    # the whole session; moving it out of the collector's generations keeps
+    # an occasional full collection from walking it mid-game
+    gc.freeze()
+
+    while running:
+        # Frames render at up to max_fps; the simulation always ticks at FPS
+        clock.tick(max_fps)
+        frame_start = time.perf_counter()
+        if allocs:
+            allocs.begin_frame()
+
+        with profiler.scope('events'):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                    session.command('save')
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                    session.command('load')
+                elif event.type == pygame.VIDEORESIZE:
+                    viewport.attach(pygame.display.get_surface())
+                    if dirty:
+                        dirty.invalidate()
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWRESTORED) and dirty:
+                    dirty.invalidate()
+
+        keys = pygame.key.get_pressed()
+        inputs = read_inputs(keys)
+        session.rewinding = history is not None and keys[pygame.K_BACKSPACE]
+        if sim:
+            if not sim.is_alive():
+                # The simulation thread died; raise what killed it, as the
+                # unpipelined loop would have
+                sim.stop()
+                break
+            sim.inputs = inputs
+            state = sim.buffer.read()
+            alpha = sim.alpha(state)
+        else:
+            for _ in range(pacer.advance()):
+                session.tick(inputs)
+            state, alpha = world, pacer.alpha
+
+        # Draw everything
+        regions = renderer.draw(viewport.surface, state, alpha)
+
+        with profiler.scope('present'):
+            viewport.present(regions)
+        if startup:
+            startup.append(('first frame', time.perf_counter()))
+            if args.startup_report:
+                print_startup_report(startup)
+            startup = None
+        if allocs:
+            allocs.end_frame()
+        if governor:
+            tier = governor.frame(time.perf_counter() - frame_start)
+            renderer.quality = tier
+            world.effects_scale = tier.particle_scale
+        if profiler.enabled:
+            counts = state.entity_counts()
+            counts['quality'] = renderer.quality.name
+            profiler.end_frame(counts)
+        else:
+            profiler.end_frame()
         await asyncio.sleep(0)
-    
+
+    if sim:
+        sim.stop()
+    if allocs:
+        allocs.stop()
+    if recorder:
+        recorder.close(world)
+    if board:
+        board.close()
+    if args.trace:
+        profiler.export_trace(args.trace)
+    if args.profile_csv:
+        profiler.export_csv(args.profile_csv)
+    if args.profile:
+        print("\n".join(profiler.report()))
+    if args.quality_report and governor:
+        print("\n".join(governor.report()))
+    if args.pacing_stats:
+        stats = pacer.stats()
+        if dirty:
+            stats.update(partial_frames=dirty.partial_frames, full_frames=dirty.full_frames)
+        for name, value in stats.items():
+            print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
     pygame.quit()
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,70 @@
+class SpatialHash:
+    # Uniform grid broadphase. Entries are bucketed by (kind, cell) so one
+    # grid built per tick serves every collision pass. Buckets are emptied
+    # rather than dropped between ticks, so steady play reuses them.
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        for bucket in self.cells.values():
+            bucket.clear()
+
+    def insert(self, kind, obj, rect):
+        cs = self.cell_size
+        entry = (obj, rect)
+        for cx in range(rect.left // cs, (rect.right - 1) // cs + 1):
+            for cy in range(rect.top // cs, (rect.bottom - 1) // cs + 1):
+                key = (kind, cx, cy)
+                bucket = self.cells.get(key)
+                if bucket is None:
+                    self.cells[key] = [entry]
+                else:
+                    bucket.append(entry)
+
+    def insert_pool(self, kind, pool):
+        # Bulk insert of every live EntityPool slot, keyed by slot index
+        n = pool.count
+        if n == 0:
+            return
+        w, h = pool.w, pool.h
+        cs = self.cell_size
+        left, top = pool.rects()
+        cx0 = (left // cs).tolist()
+        cx1 = ((left + (w - 1)) // cs).tolist()
+        cy0 = (top // cs).tolist()
+        cy1 = ((top + (h - 1)) // cs).tolist()
+        cells = self.cells
+        for i, l, t in zip(range(n), left.tolist(), top.tolist()):
+            entry = (i, (l, t, w, h))
+            for cx in range(cx0[i], cx1[i] + 1):
+                for cy in range(cy0[i], cy1[i] + 1):
+                    key = (kind, cx, cy)
+                    bucket = cells.get(key)
+                    if bucket is None:
+                        cells[key] = [entry]
+                    else:
+                        bucket.append(entry)
+
+    def query(self, kind, rect):
+        # Returns (obj, rect) pairs of the given kind that overlap rect
+        cs = self.cell_size
+        cx0, cx1 = rect.left // cs, (rect.right - 1) // cs
+        cy0, cy1 = rect.top // cs, (rect.bottom - 1) // cs
+        cells = self.cells
+        hits = []
+        if cx0 == cx1 and cy0 == cy1:
+            for entry in cells.get((kind, cx0, cy0), ()):
+                if rect.colliderect(entry[1]):
+                    hits.append(entry)
+            return hits
+
+        seen = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for entry in cells.get((kind, cx, cy), ()):
+                    obj = entry[0]
+                    if obj not in seen and rect.colliderect(entry[1]):
+                        seen.add(obj)
+                        hits.append(entry)
+        return hits
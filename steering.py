@@ -0,0 +1,81 @@
+import numpy as np
+
+# Cells are packed into one int64 key; coordinates are offset so entities a
+# long way off screen still get distinct, non-negative keys
+KEY_OFFSET = 1 << 20
+KEY_STRIDE = 1 << 21
+NEIGHBOR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+NEIGHBOR_DX = np.array([dx for dx, _ in NEIGHBOR_OFFSETS])[:, None]
+NEIGHBOR_DY = np.array([dy for _, dy in NEIGHBOR_OFFSETS])[:, None]
+
+class NeighborGrid:
+    # Uniform grid over point arrays for radius queries. Building sorts the
+    # points by cell key instead of inserting them into buckets one at a
+    # time, and a query looks up all nine surrounding cells for every point
+    # at once with searchsorted, so both are a handful of NumPy calls and
+    # cost O(n + pairs) rather than the O(n^2) of testing every pair.
+    def __init__(self, cell_size=48.0):
+        self.cell_size = cell_size
+        self.count = 0
+
+    def build(self, x, y):
+        self.x = x
+        self.y = y
+        self.count = len(x)
+        self.cx = np.floor(x / self.cell_size).astype(np.int64)
+        self.cy = np.floor(y / self.cell_size).astype(np.int64)
+        keys = (self.cx + KEY_OFFSET) * KEY_STRIDE + (self.cy + KEY_OFFSET)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def pairs(self, radius):
+        # Every ordered pair (i, j), i != j, closer than `radius`, which
+        # must not exceed the cell size. Returns i, j and the offsets
+        # dx = x[i] - x[j], dy = y[i] - y[j] and squared distances.
+        n = self.count
+        if n < 2:
+            empty = np.empty(0, np.int64)
+            return empty, empty, np.empty(0), np.empty(0), np.empty(0)
+        # Keys of the nine cells around every point, searched in one call
+        keys = ((self.cx + NEIGHBOR_DX + KEY_OFFSET) * KEY_STRIDE
+                + (self.cy + NEIGHBOR_DY + KEY_OFFSET)).ravel()
+        lo = np.searchsorted(self.sorted_keys, keys, 'left')
+        hi = np.searchsorted(self.sorted_keys, keys, 'right')
+        counts = hi - lo
+        total = int(counts.sum())
+        # Expand each [lo, hi) run into one row per candidate
+        starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        i = np.repeat(np.tile(np.arange(n), len(NEIGHBOR_OFFSETS)), counts)
+        j = self.order[starts + np.arange(total)]
+        ddx = self.x[i] - self.x[j]
+        ddy = self.y[i] - self.y[j]
+        d2 = ddx * ddx + ddy * ddy
+        keep = (i != j) & (d2 < radius * radius)
+        return i[keep], j[keep], ddx[keep], ddy[keep], d2[keep]
+
+def separation(n, i, dx, dy, d2):
+    # Push away from each neighbour, weighted by inverse distance so the
+    # closest dominate; (sx, sy) per point
+    w = 1.0 / np.maximum(d2, 1.0)
+    return np.bincount(i, dx * w, n), np.bincount(i, dy * w, n)
+
+def flock_terms(n, i, j, x, y, vx, vy, mask):
+    # Cohesion (towards the neighbours' mean position) and alignment
+    # (towards their mean velocity) over the pairs whose both ends are in
+    # `mask`; points without such neighbours get zeros
+    sel = mask[i] & mask[j]
+    i, j = i[sel], j[sel]
+    counts = np.bincount(i, minlength=n)
+    has = counts > 0
+    div = np.maximum(counts, 1)
+    cohesion_x = np.where(has, np.bincount(i, x[j], n) / div - x, 0.0)
+    cohesion_y = np.where(has, np.bincount(i, y[j], n) / div - y, 0.0)
+    align_x = np.where(has, np.bincount(i, vx[j], n) / div - vx, 0.0)
+    align_y = np.where(has, np.bincount(i, vy[j], n) / div - vy, 0.0)
+    return cohesion_x, cohesion_y, align_x, align_y
+
+def clamp_length(x, y, limit):
+    # Scales the vectors (x, y) down to at most `limit` (scalar or per point)
+    length = np.hypot(x, y)
+    scale = np.where(length > limit, limit / np.maximum(length, 1e-9), 1.0)
+    return x * scale, y * scale
@@ -0,0 +1,85 @@
+# Networked co-op over localhost: a server and a headless client in one
+# event loop, run in real time.
+#
+#   python -m unittest tests.test_netplay
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import asyncio
+import unittest
+
+from netplay import (
+    INPUT, K_PLAYER, MAX_VIEWS, MSG_INPUT, NO_TICK, POS_SCALE, NetClient, NetServer, write_message,
+)
+from space_defender import FPS, INPUT_FIRE, INPUT_RESTART, World
+
+async def session(ticks, drive):
+    # Runs the server for `ticks` ticks with one client, calling
+    # drive(client, server, tick) once a tick in place of the player
+    world = World(seed=1, players=1)
+    server = NetServer(world, port=0)
+    await server.start()
+    client = NetClient()
+    await client.connect('127.0.0.1', server.port)
+    receiver = asyncio.ensure_future(client.receive())
+    serving = asyncio.ensure_future(server.run(ticks))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        for tick in range(ticks):
+            drive(client, server, tick)
+            await asyncio.sleep(max(0.0, start + (tick + 1) / FPS - loop.time()))
+        await asyncio.wait_for(serving, 5)
+        # Let the last states arrive
+        await asyncio.sleep(0.1)
+    finally:
+        client.close()
+        await server.close()
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+    return client, server
+
+class RestartTest(unittest.TestCase):
+    def test_restart_keeps_syncing(self):
+        log = {'over': 0, 'restarted': False}
+
+        def drive(client, server, tick):
+            world = server.world
+            if tick == FPS:
+                world.players[0].health = 0
+            over = client.header is not None and client.header[8] & 2
+            if over:
+                log['over'] += 1
+            elif log['over']:
+                log['restarted'] = True
+            # Restart half a second into the game over screen
+            client.send_input(INPUT_RESTART if log['over'] > FPS // 2 and over else INPUT_FIRE)
+            client.sync_world()
+
+        client, server = asyncio.run(session(4 * FPS, drive))
+        self.assertTrue(log['restarted'])
+        # The world started over but the ticks on the wire kept counting
+        self.assertLess(server.world.tick, server.ticks)
+        self.assertEqual(client.tick, server.ticks)
+        self.assertLessEqual(len(server.clients[0].views), MAX_VIEWS)
+        self.assertLessEqual(len(client.views), MAX_VIEWS + 1)
+        player = server.world.players[0]
+        rec = client.views[client.tick][(K_PLAYER, 0)]
+        self.assertEqual((rec[0] // POS_SCALE, rec[1] // POS_SCALE), (player.x, player.y))
+        self.assertGreater(player.health, 0)
+
+    def test_views_bounded_without_acks(self):
+        def drive(client, server, tick):
+            # A client that never acknowledges a tick
+            client.seq += 1
+            write_message(client.writer, MSG_INPUT, INPUT.pack(client.seq, 0, NO_TICK))
+            client.sync_world()
+
+        client, server = asyncio.run(session(3 * FPS, drive))
+        self.assertEqual(len(server.clients[0].views), MAX_VIEWS)
+        self.assertEqual(client.tick, server.ticks)
+        self.assertLessEqual(len(client.views), MAX_VIEWS + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+# Batch environment API for running many independent games at once, for
+# training and evaluating autopilot agents.
+#
+#   env = VecEnv(64)                       # all games in this process
+#   env = ProcessVecEnv(64, workers=8)     # sharded across processes
+#   obs = env.reset(seeds)
+#   obs, rewards, dones, infos = env.step(actions)
+#
+# Actions are per-game input bitmasks (INPUT_LEFT | INPUT_FIRE, ...).
+# Rewards are score deltas. A game that ends is reset in place, continuing
+# its random stream, and its final score and wave are reported in infos.
+# The returned arrays are buffers reused by the next call; copy them to keep.
+# Observations are fixed-size float32 vectors, laid out as:
+#
+#   player        x, y, health, shield, weapon level, rapid fire, wave
+#   enemies       NEAREST_ENEMIES x (present, dx, dy, speed, type)
+#   enemy bullets NEAREST_BULLETS x (present, dx, dy, vx, vy)
+#   boss          present, dx, dy, health, phase
+#
+# Positions are scaled by the screen size and relative offsets are measured
+# from the player's centre; missing slots are zero.
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from space_defender import HEIGHT, INPUT_RESTART, WIDTH, World
+
+NEAREST_ENEMIES = 8
+NEAREST_BULLETS = 16
+PLAYER_FEATURES = 7
+ENEMY_FEATURES = 5
+BULLET_FEATURES = 5
+BOSS_FEATURES = 5
+OBS_SIZE = (PLAYER_FEATURES + NEAREST_ENEMIES * ENEMY_FEATURES
+            + NEAREST_BULLETS * BULLET_FEATURES + BOSS_FEATURES)
+
+ENEMY_TYPE_CODES = {'normal': 0.0, 'fast': 0.5, 'tank': 1.0}
+
+def nearest(dx, dy, k):
+    # Indices of the k smallest distances, closest first
+    d2 = dx * dx + dy * dy
+    if len(d2) > k:
+        idx = np.argpartition(d2, k)[:k]
+    else:
+        idx = np.arange(len(d2))
+    return idx[np.argsort(d2[idx])]
+
+def encode_observation(world, out):
+    # Writes the observation for `world` into the float32 row `out`
+    out[:] = 0
+    p = world.player
+    cx = p.x + p.w / 2
+    cy = p.y + p.h / 2
+    out[:PLAYER_FEATURES] = (p.x / WIDTH, p.y / HEIGHT, p.health / p.max_health,
+                             p.shield / p.max_shield, p.weapon_level / 3,
+                             world.rapid_fire_timer > 0, world.wave / 20)
+    pos = PLAYER_FEATURES
+
+    enemies = world.enemies
+    if enemies:
+        ex = np.fromiter((e.x + e.w / 2 for e in enemies), float, len(enemies))
+        ey = np.fromiter((e.y + e.h / 2 for e in enemies), float, len(enemies))
+        dx, dy = (ex - cx) / WIDTH, (ey - cy) / HEIGHT
+        idx = nearest(dx, dy, NEAREST_ENEMIES)
+        block = out[pos:pos + len(idx) * ENEMY_FEATURES].reshape(-1, ENEMY_FEATURES)
+        block[:, 0] = 1
+        block[:, 1] = dx[idx]
+        block[:, 2] = dy[idx]
+        block[:, 3] = [enemies[i].speed / 5 for i in idx.tolist()]
+        block[:, 4] = [ENEMY_TYPE_CODES.get(enemies[i].type, 0.0) for i in idx.tolist()]
+    pos += NEAREST_ENEMIES * ENEMY_FEATURES
+
+    pool = world.enemy_bullets
+    n = pool.count
+    if n:
+        dx = (pool.x[:n] - cx) / WIDTH
+        dy = (pool.y[:n] - cy) / HEIGHT
+        idx = nearest(dx, dy, NEAREST_BULLETS)
+        block = out[pos:pos + len(idx) * BULLET_FEATURES].reshape(-1, BULLET_FEATURES)
+        block[:, 0] = 1
+        block[:, 1] = dx[idx]
+        block[:, 2] = dy[idx]
+        block[:, 3] = pool.vx[idx] / 5
+        block[:, 4] = pool.vy[idx] / 5
+    pos += NEAREST_BULLETS * BULLET_FEATURES
+
+    boss = world.boss
+    if world.boss_active and boss:
+        out[pos:pos + BOSS_FEATURES] = (1, (boss.x + boss.w / 2 - cx) / WIDTH,
+                                        (boss.y + boss.h / 2 - cy) / HEIGHT,
+                                        boss.health / boss.max_health, boss.phase - 1)
+
+class GameBatch:
+    # A slice of independent games that writes observations, rewards and
+    # done flags into caller-provided arrays (shared memory for workers)
+    def __init__(self, count, obs, rewards, dones, frame_skip=1):
+        self.worlds = [World(0) for _ in range(count)]
+        self.obs = obs
+        self.rewards = rewards
+        self.dones = dones
+        self.frame_skip = frame_skip
+        self.scores = [0] * count
+
+    def reset(self, seeds):
+        for i, seed in enumerate(seeds):
+            self.worlds[i] = World(int(seed))
+            self.scores[i] = 0
+            encode_observation(self.worlds[i], self.obs[i])
+        self.rewards[:] = 0
+        self.dones[:] = 0
+
+    def step(self, actions):
+        # Returns {index: (final score, final wave)} for games that ended
+        finished = {}
+        for i, world in enumerate(self.worlds):
+            inputs = int(actions[i]) & ~INPUT_RESTART
+            for _ in range(self.frame_skip):
+                world.step(inputs)
+                if world.game_over:
+                    break
+            self.rewards[i] = world.score - self.scores[i]
+            self.dones[i] = world.game_over
+            if world.game_over:
+                finished[i] = (world.score, world.wave)
+                world.reset()
+            self.scores[i] = world.score
+            encode_observation(world, self.obs[i])
+        return finished
+
+class VecEnv:
+    # N games stepped in the calling process
+    def __init__(self, num_envs, frame_skip=1):
+        self.num_envs = num_envs
+        self.obs = np.zeros((num_envs, OBS_SIZE), np.float32)
+        self.rewards = np.zeros(num_envs, np.float32)
+        self.dones = np.zeros(num_envs, np.uint8)
+        self.batch = GameBatch(num_envs, self.obs, self.rewards, self.dones, frame_skip)
+
+    def reset(self, seeds=None):
+        if seeds is None:
+            seeds = range(self.num_envs)
+        self.batch.reset(seeds)
+        return self.obs
+
+    def step(self, actions):
+        finished = self.batch.step(actions)
+        infos = [{'final': finished[i]} if i in finished else {} for i in range(self.num_envs)]
+        return self.obs, self.rewards, self.dones.astype(bool), infos
+
+    def close(self):
+        pass
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+def _worker(conn, start, end, names, num_envs, frame_skip):
+    # Owns games [start, end); reads actions and writes results straight
+    # into the shared buffers, and only sends small messages over the pipe
+    shms = []
+    arrays = []
+    for name, shape, dtype in zip(names, [(num_envs, OBS_SIZE), (num_envs,), (num_envs,), (num_envs,)],
+                                  [np.float32, np.float32, np.uint8, np.uint8]):
+        shm, arr = _attach(name, shape, dtype)
+        shms.append(shm)
+        arrays.append(arr)
+    obs, rewards, dones, actions = arrays
+    batch = GameBatch(end - start, obs[start:end], rewards[start:end], dones[start:end], frame_skip)
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == 'step':
+                finished = batch.step(actions[start:end])
+                conn.send({start + i: f for i, f in finished.items()})
+            elif cmd == 'reset':
+                batch.reset(arg)
+                conn.send(None)
+            elif cmd == 'close':
+                break
+    finally:
+        for shm in shms:
+            shm.close()
+        conn.close()
+
+class ProcessVecEnv:
+    # N games sharded across a pool of worker processes. Observations,
+    # rewards, done flags and actions live in shared memory so a step only
+    # costs one small message per worker each way.
+    def __init__(self, num_envs, workers=None, frame_skip=1, context=None):
+        workers = min(num_envs, workers or multiprocessing.cpu_count())
+        ctx = multiprocessing.get_context(context)
+        self.num_envs = num_envs
+
+        specs = [((num_envs, OBS_SIZE), np.float32), ((num_envs,), np.float32),
+                 ((num_envs,), np.uint8), ((num_envs,), np.uint8)]
+        self.shms = []
+        arrays = []
+        for shape, dtype in specs:
+            nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.shms.append(shm)
+            arrays.append(np.ndarray(shape, dtype, buffer=shm.buf))
+        self.obs, self.rewards, self.dones, self.actions = arrays
+        names = [shm.name for shm in self.shms]
+
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int)
+        self.slices = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        self.conns = []
+        self.procs = []
+        for start, end in self.slices:
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, args=(child, start, end, names, num_envs, frame_skip),
+                               daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+
+    def reset(self, seeds=None):
+        if seeds is None:
+            seeds = range(self.num_envs)
+        seeds = list(seeds)
+        for conn, (start, end) in zip(self.conns, self.slices):
+            conn.send(('reset', seeds[start:end]))
+        for conn in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        self.actions[:] = actions
+        for conn in self.conns:
+            conn.send(('step', None))
+        finished = {}
+        for conn in self.conns:
+            finished.update(conn.recv())
+        infos = [{'final': finished[i]} if i in finished else {} for i in range(self.num_envs)]
+        return self.obs, self.rewards, self.dones.astype(bool), infos
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self.procs:
+            proc.join(timeout=5)
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+        self.shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
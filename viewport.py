@@ -0,0 +1,80 @@
+import pygame
+
+BLACK = (0, 0, 0)
+
+def scale_rect(rect, scale):
+    # A logical (x, y, w, h) in render-surface pixels at `scale`
+    x, y, w, h = rect
+    return int(x * scale), int(y * scale), int(w * scale), int(h * scale)
+
+def line_width(width, scale):
+    # Outline width at `scale`; pygame.draw treats 0 as filled
+    return max(1, int(width * scale))
+
+def fit(size, bounds):
+    # Largest size with the aspect ratio of `size` that fits in `bounds`
+    w, h = size
+    bw, bh = bounds
+    scale = min(bw / w, bh / h)
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+class Viewport:
+    # Where frames are drawn and how they reach the window. The game draws
+    # into `surface`, which is the logical playfield at `scale` (so 0.5
+    # draws a quarter of the pixels and 2 twice the detail). present()
+    # scales it to the largest rect of the same shape that fits the window
+    # and fills the bars either side. When the render size already is the
+    # window size `surface` is the window itself, nothing is scaled, and
+    # dirty-rect presentation still applies. Call attach() again after the
+    # window is resized.
+    def __init__(self, logical_size, scale=1.0, smooth=False):
+        self.logical_size = logical_size
+        self.scale = scale
+        self.size = (max(1, round(logical_size[0] * scale)), max(1, round(logical_size[1] * scale)))
+        self.smooth = smooth
+        self.window = None
+        self.surface = None
+        self.offscreen = None
+        self.target = None
+        self.bars = []
+
+    @property
+    def direct(self):
+        return self.surface is self.window
+
+    def attach(self, window):
+        self.window = window
+        if window.get_size() == self.size:
+            self.surface = window
+            self.target = None
+            self.bars = []
+            return
+        if self.offscreen is None:
+            self.offscreen = pygame.Surface(self.size).convert()
+        self.surface = self.offscreen
+        ww, wh = window.get_size()
+        w, h = fit(self.size, (ww, wh))
+        dest = pygame.Rect((ww - w) // 2, (wh - h) // 2, w, h)
+        self.target = window.subsurface(dest)
+        # Letterbox or pillarbox bars, whichever the shapes leave
+        self.bars = [r for r in (pygame.Rect(0, 0, ww, dest.top),
+                                 pygame.Rect(0, dest.bottom, ww, wh - dest.bottom),
+                                 pygame.Rect(0, 0, dest.left, wh),
+                                 pygame.Rect(dest.right, 0, ww - dest.right, wh)) if r.width and r.height]
+
+    def present(self, regions=None):
+        # `regions` are the rects Renderer.draw returned (None for the
+        # whole frame); scaled frames are always presented whole
+        if self.direct:
+            if regions is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(regions)
+            return
+        if self.smooth:
+            pygame.transform.smoothscale(self.surface, self.target.get_size(), self.target)
+        else:
+            pygame.transform.scale(self.surface, self.target.get_size(), self.target)
+        for bar in self.bars:
+            self.window.fill(BLACK, bar)
+        pygame.display.flip()